@@ -1 +1,3 @@
-# -*- coding: utf-8 -*-
+# -*- coding: utf-8 -*-
+
+__version__ = '1.1.0'
@@ -4,6 +4,14 @@ from __future__ import absolute_import, print_function, unicode_literals
 
 
 def main():
+    import os
+    import sys
+
+    if '--startup-profile' in sys.argv or os.environ.get('RPY_STARTUP_PROFILE'):
+        #imports are only timed after the hook is installed, before importing the cli
+        from rpy.cli.startup import enable
+        enable()
+
     from rpy.cli.dispatch import execute_from_command_line
     execute_from_command_line()    
 
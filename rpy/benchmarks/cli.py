@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from rpy.cli.dispatch import DispatchCommand
+from rpy.cli.manifest import CommandManifest
+from rpy.cli.utils import discover_with_convention
+from rpy.functions.require import missing_requirements
+
+
+def benchmark_discovery():
+    folder = tempfile.mkdtemp()
+    manifest = CommandManifest(
+        DispatchCommand.modules, DispatchCommand.class_name, path=os.path.join(folder, 'commands.json'))
+    manifest.commands()
+
+    yield 'walk', lambda: discover_with_convention(DispatchCommand.modules, DispatchCommand.class_name)
+    yield 'manifest', manifest.commands
+
+    shutil.rmtree(folder)
+
+
+def benchmark_startup():
+    folder = tempfile.mkdtemp()
+
+    def run(path):
+        env = dict(os.environ, RPY_COMMANDS_MANIFEST=path)
+        return lambda: subprocess.call(
+            [sys.executable, '-m', 'rpy'], env=env, stdout=subprocess.DEVNULL)
+
+    yield 'walk', run('')
+    yield 'manifest', run(os.path.join(folder, 'commands.json'))
+
+    shutil.rmtree(folder)
+
+
+def benchmark_require():
+    folder = tempfile.mkdtemp()
+    path = os.path.join(folder, 'requirements.json')
+    requirements = ('pip', 'setuptools')
+
+    tuple(missing_requirements(*requirements, cache=path))
+
+    yield 'metadata', lambda: tuple(missing_requirements(*requirements, cache=False))
+    yield 'cached', lambda: tuple(missing_requirements(*requirements, cache=path))
+
+    shutil.rmtree(folder)
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import os
+import shutil
+import tempfile
+
+from rpy.functions.debug import TimingRegistry
+from rpy.functions.diskcache import disk_memoize
+
+
+def infer_types(rows):
+    #a stand in for an expensive pure transform
+    return tuple(
+        sorted(set(type(value).__name__ for row in rows for value in row))
+        for _ in range(50)
+    )
+
+
+def benchmark_disk_memoize():
+    folder = tempfile.mkdtemp()
+    rows = [(i, str(i), i / 3., None) for i in range(2000)]
+
+    cached = disk_memoize(infer_types, path=os.path.join(folder, 'cache.sqlite'))
+    memory = disk_memoize(infer_types, path=os.path.join(folder, 'cache.sqlite'), memory=16)
+
+    def cold():
+        cached.cache_clear()
+        return cached(rows)
+
+    try:
+        yield 'uncached', lambda: infer_types(rows)
+        yield 'cold', cold
+        yield 'warm', lambda: cached(rows)
+        yield 'warm, memory tier', lambda: memory(rows)
+    finally:
+        cached.cache.close()
+        shutil.rmtree(folder)
+
+
+def benchmark_instrument():
+    def noop(x):
+        return x
+
+    disabled = TimingRegistry(enabled=False)
+    enabled = TimingRegistry()
+
+    plain = lambda: [noop(i) for i in range(1000)]
+
+    def timed(registry):
+        function = registry.instrument('noop')(noop)
+        return lambda: [function(i) for i in range(1000)]
+
+    def blocks(registry):
+        def run():
+            for i in range(1000):
+                with registry.timer('noop'):
+                    pass
+        return run
+
+    yield 'plain', plain
+    yield 'instrument, disabled', timed(disabled)
+    yield 'instrument, enabled', timed(enabled)
+    yield 'timer, disabled', blocks(disabled)
+    yield 'timer, enabled', blocks(enabled)
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+from rpy.functions.encoding import (force_bytes, force_bytes_joined,
+                                    force_bytes_many, force_text,
+                                    force_text_columns, force_text_many)
+
+
+def benchmark_force_text():
+    text = ['value %i' % i for i in range(10000)]
+    binary = [value.encode('utf-8') for value in text]
+    mixed = [i % 3 and i or 'value' for i in range(10000)]
+
+    yield 'text per cell', lambda: [force_text(value) for value in text]
+    yield 'text many', lambda: force_text_many(text)
+    yield 'bytes per cell', lambda: [force_text(value) for value in binary]
+    yield 'bytes many', lambda: force_text_many(binary)
+    yield 'mixed per cell', lambda: [force_text(value) for value in mixed]
+    yield 'mixed many', lambda: force_text_many(mixed)
+
+
+def benchmark_force_text_columns():
+    rows = [('name %i' % i, i, i / 2., b'code') for i in range(2500)]
+
+    yield 'per cell', lambda: [tuple(map(force_text, row)) for row in rows]
+    yield 'columns', lambda: force_text_columns(rows)
+
+
+def benchmark_force_bytes():
+    text = ['value %i' % i for i in range(10000)]
+
+    yield 'per cell', lambda: [force_bytes(value) for value in text]
+    yield 'many', lambda: force_bytes_many(text)
+    yield 'joined', lambda: force_bytes_joined(text)
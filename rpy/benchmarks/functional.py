@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import inspect
+from array import array
+from functools import reduce
+
+from rpy.functions import six
+from rpy.functions.functional import (composition, flatten, identity, iterate,
+                                      partition)
+from rpy.functions.stream import Stream
+
+
+def lambda_chain(*functions):
+    #the nested lambda implementation composition used to have
+    return reduce(
+        lambda f, g: lambda *args, **kw: f(g(*args, **kw)),
+        reversed(functions or (identity, ))
+    )
+
+
+def recursive_is_iterable(obj, exclude_list=six.string_types):
+    if isinstance(obj, exclude_list):
+        return False
+    return not inspect.isclass(obj) and hasattr(obj, '__iter__')
+
+
+def recursive_iterate(*args):
+    #the generator based implementations flatten and iterate used to have
+    for arg in args:
+        if not recursive_is_iterable(arg):
+            yield arg
+        else:
+            for item in arg:
+                yield item
+
+
+def recursive_flatten(*args):
+    for arg in args:
+        if recursive_is_iterable(arg):
+            for sub in arg:
+                for el in recursive_flatten(sub):
+                    yield el
+        else:
+            yield arg
+
+
+def nested(depth, value):
+    for i in range(depth):
+        value = [value, i]
+    return value
+
+
+def benchmark_composition():
+    for depth in (1, 2, 5, 10, 20):
+        functions = (identity, ) * depth
+        for name, factory in (('lambda chain', lambda_chain), ('composition', composition)):
+            yield 'depth %2i, %s' % (depth, name), \
+                lambda f=factory(*functions): f(1)
+
+
+def benchmark_flatten():
+    inputs = (
+        ('wide scalars', tuple(range(10000))),
+        ('wide mixed', tuple(i % 3 and ('a', i) or 'b' for i in range(10000))),
+        ('deep', nested(500, 1)),
+    )
+    for label, value in inputs:
+        for name, function in (('recursive', recursive_flatten), ('stack', flatten)):
+            yield '%s, %s' % (label, name), lambda f=function, v=value: tuple(f(v))
+
+
+def benchmark_iterate():
+    value = tuple(i % 2 and (i, i) or i for i in range(10000))
+    for name, function in (('recursive', recursive_iterate), ('cached', iterate)):
+        yield 'wide mixed, %s' % name, lambda f=function: tuple(f(*value))
+
+
+def _consume(chunks):
+    for chunk in chunks:
+        len(chunk)
+
+
+def benchmark_partition():
+    inputs = [
+        ('list', list(range(100000)), 1000),
+        ('bytes', bytes(bytearray(range(256))) * 4096, 65536),
+        ('bytearray', bytearray(range(256)) * 4096, 65536),
+        ('memoryview', memoryview(bytes(bytearray(range(256))) * 4096), 65536),
+        ('array', array('d', range(100000)), 1000),
+    ]
+    try:
+        import numpy
+    except ImportError:
+        pass
+    else:
+        inputs.append(('numpy', numpy.arange(100000), 1000))
+
+    for label, value, n in inputs:
+        for copy in (True, False):
+            yield '%s, copy=%s' % (label, copy), \
+                lambda v=value, n=n, copy=copy: _consume(partition(v, n, copy=copy))
+
+
+def benchmark_stream():
+    source = tuple(range(100000))
+    increment, odd, double = lambda i: i + 1, lambda i: i % 3, lambda i: i * 2
+
+    def generators():
+        values = (increment(i) for i in source)
+        values = (i for i in values if odd(i))
+        values = (double(i) for i in values)
+        return tuple(values)
+
+    def stream():
+        return Stream(source).map(increment).filter(odd).map(double).collect()
+
+    yield 'map, filter, map, generators', generators
+    yield 'map, filter, map, stream', stream
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import timeit
+from fnmatch import fnmatch
+
+from rpy.cli.utils import SimpleCommand, discover_with_convention
+from rpy.functions.importutils import import_string
+
+
+class Command(SimpleCommand):
+    """ Run benchmarks from the benchmarks modules.
+    A list of patterns can be provided to specify the modules, or module.benchmark, to run.
+
+    Each module exposes benchmark_* functions yielding (label, callable) pairs, 
+    the best time per call is reported for every callable.
+    """
+
+    modules = ['rpy.benchmarks']
+
+    def add_arguments(self, parser):
+        parser.add_argument('args', nargs='*')
+        parser.add_argument('--repeat', dest='repeat', type=int, default=5)
+
+    def timeit(self, function, repeat):
+        timer = timeit.Timer(function)
+        number, _ = timer.autorange()
+        return min(timer.repeat(repeat, number)) / number
+
+    def handle(self, *args, repeat=5):
+
+        benchmarks = discover_with_convention(self.modules, '__module__')
+
+        for name in sorted(benchmarks):
+            if args and not any(fnmatch(name, arg.split('.')[0]) for arg in args):
+                continue
+
+            module = import_string(benchmarks[name])
+
+            for attr in sorted(dir(module)):
+                full_name = '%s.%s' % (name, attr[10:])
+                if not attr.startswith('benchmark_'):
+                    continue
+                if args and not any(fnmatch(name, arg) or fnmatch(full_name, arg) for arg in args):
+                    continue
+                for label, function in getattr(module, attr)():
+                    self.print('%s %s: %.3f µs' % (
+                        full_name, label, self.timeit(function, repeat) * 1e6))
@@ -10,6 +10,7 @@ from rpy.functions.encoding import force_text
 class Command(SimpleCommand):
 
     dependencies = (('cryptography', None), )
+    preload = ((fernet, ('Fernet', )), )
 
     def handle(self,
                name=None,
@@ -2,9 +2,6 @@
 
 from __future__ import absolute_import, print_function, unicode_literals
 
-import argparse
-import hashlib
-import hmac
 import os
 
 from rpy.cli.utils import SimpleCommand
@@ -18,6 +15,7 @@ def validate(s, env, name):
         try:
             return os.environ[env]
         except KeyError:
+            import argparse
             raise argparse.ArgumentTypeError(
                 '%s is not defined, please use --%s or set an %s in your env' %
                 (name, name, env))
@@ -26,6 +24,7 @@ def validate(s, env, name):
 class Command(SimpleCommand):
 
     dependencies = (('cryptography', None), )
+    preload = ((fernet, ('Fernet', )), )
 
     def add_arguments(self, parser):
         parser.add_argument('args', nargs='*', type=str)
@@ -38,6 +37,9 @@ class Command(SimpleCommand):
         parser.add_argument('--print',   dest='printonly',  default=False, action = 'store_true')
 
     def default_secret(self, name, password):
+        import hashlib
+        import hmac
+
         return "!%s" % force_text(
             base64.dumps(hmac.new(
                 key = force_bytes(password),
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import argparse
+import cProfile
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+
+from rpy.cli.dispatch import DispatchCommand
+from rpy.cli.utils import SimpleCommand
+
+
+class PeakSnapshot(object):
+    """ Take a tracemalloc snapshot every time the traced memory grows by more than `growth` over the last snapshot,
+    checking every `interval` seconds in a background thread, so that the last snapshot is close to the peak. """
+
+    def __init__(self, interval=0.01, growth=0.1):
+        self.interval = interval
+        self.growth = growth
+        self.snapshot = None
+        self.size = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='rpy-profile-snapshot', daemon=True)
+
+    def take(self, force=False):
+        current, peak = tracemalloc.get_traced_memory()
+        if self.snapshot is None or force and current > self.size or current > self.size * (1 + self.growth):
+            self.snapshot, self.size = tracemalloc.take_snapshot(), current
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.take()
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        #the memory still allocated at exit, when it's the largest sample
+        self.take(force=True)
+
+
+class Command(SimpleCommand):
+    """ Run another command under cProfile and tracemalloc, i.e. :code:`python -m rpy profile --output export benchmark encoding`.
+
+    The functions with the highest time, the peak memory and the lines holding most memory near the peak are printed to stderr.
+    Allocations are sampled every --interval seconds, the snapshot closest to the peak is reported.
+    With --output the profile and the memory snapshot are written to PREFIX.pstats and PREFIX.tracemalloc,
+    a snapshot can be passed to --compare in a later run to print the lines whose allocations changed the most.
+    """
+
+    #frames added by the import machinery and by tracemalloc itself
+    ignored_files = ('<frozen importlib._bootstrap>', '<frozen importlib._bootstrap_external>', '<unknown>', tracemalloc.__file__)
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cpu', dest='cpu', action='store_true', help='only run cProfile')
+        parser.add_argument('--memory', dest='memory', action='store_true', help='only run tracemalloc')
+        parser.add_argument('--sort', dest='sort', default='cumulative')
+        parser.add_argument('--limit', dest='limit', type=int, default=25)
+        parser.add_argument('--frames', dest='frames', type=int, default=1, help='frames stored for each allocation')
+        parser.add_argument('--interval', dest='interval', type=float, default=0.01, help='seconds between memory samples')
+        parser.add_argument('--output', dest='output', default=None)
+        parser.add_argument('--compare', dest='compare', default=None)
+        parser.add_argument('args', nargs=argparse.REMAINDER)
+
+    def write(self, line=''):
+        print(line, file=sys.stderr)
+
+    def report_cpu(self, profiler, sort, limit, output):
+        self.write('CPU profile:')
+        pstats.Stats(profiler, stream=sys.stderr).strip_dirs().sort_stats(sort).print_stats(limit)
+        if output:
+            profiler.dump_stats('%s.pstats' % output)
+
+    def report_memory(self, sampler, peak, limit, output, compare):
+        snapshot = sampler.snapshot.filter_traces([
+            tracemalloc.Filter(False, filename) for filename in self.ignored_files])
+
+        self.write('Memory profile, peak %.3f MiB:' % (peak / 1024 / 1024))
+        self.write('Allocated when %.3f MiB were traced, the sample closest to the peak:' % (sampler.size / 1024 / 1024))
+        for stat in snapshot.statistics('lineno')[:limit]:
+            self.write('  %s' % stat)
+
+        if compare:
+            self.write('Memory compared to %s:' % compare)
+            for stat in snapshot.compare_to(tracemalloc.Snapshot.load(compare), 'lineno')[:limit]:
+                self.write('  %s' % stat)
+
+        if output:
+            snapshot.dump('%s.tracemalloc' % output)
+
+    def handle(self, *args, cpu=False, memory=False, sort='cumulative', limit=25, frames=1, interval=0.01, output=None, compare=None):
+
+        if not cpu and not memory:
+            cpu = memory = True
+
+        profiler = cpu and cProfile.Profile() or None
+        sampler = memory and PeakSnapshot(interval) or None
+
+        if sampler:
+            tracemalloc.start(frames)
+            sampler.start()
+
+        t = time.perf_counter()
+
+        if profiler:
+            profiler.enable()
+        try:
+            return DispatchCommand([self.argv[0]] + list(args)).main()
+        finally:
+            #the report is printed even when the command exits with sys.exit
+            if profiler:
+                profiler.disable()
+
+            elapsed = time.perf_counter() - t
+
+            if sampler:
+                sampler.stop()
+                current, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+
+            self.write('Profiled %s in %.3f sec' % (' '.join(args), elapsed))
+
+            if profiler:
+                self.report_cpu(profiler, sort, limit, output)
+            if sampler:
+                self.report_memory(sampler, peak, limit, output, compare)
@@ -2,9 +2,12 @@
 
 from __future__ import absolute_import, print_function, unicode_literals
 
+import os
 import sys
 
-from rpy.cli.utils import SimpleCommand, discover_with_convention
+from rpy.cli import startup
+from rpy.cli.manifest import CommandManifest
+from rpy.cli.utils import SimpleCommand
 from rpy.functions.importutils import import_string
 from rpy.functions.require import require_module
 
@@ -19,18 +22,20 @@ class DispatchCommand(SimpleCommand):
     dependencies = []
 
     def subcommands(self):
-        return discover_with_convention(self.modules, self.class_name)
+        return CommandManifest(self.modules, self.class_name).commands()
 
     def handle(self, attr=None):
 
-        all_commands = self.subcommands()
+        with startup.phase('discovery'):
+            all_commands = self.subcommands()
 
         if attr is None and self.default_command:
             attr = self.default_command
 
         if attr in all_commands:
-            return import_string(all_commands[attr])(
-                self.subcommand_args(), name=all_commands[attr]).main()
+            with startup.phase('command import'):
+                command = import_string(all_commands[attr])
+            return command(self.subcommand_args(), name=all_commands[attr]).main()
 
         self.print('Select one of the following commands:')
         for command in sorted(all_commands.keys()):
@@ -54,5 +59,25 @@ class DispatchCommand(SimpleCommand):
         return self.handle()
 
 
-def execute_from_command_line(argv=None, **opts):
-    return DispatchCommand(argv).main()
+def execute_from_command_line(argv=None, startup_profile=None, **opts):
+    """ Run the command named by the first argument.
+
+    With :code:`--startup-profile`, `startup_profile` or the :code:`RPY_STARTUP_PROFILE` env variable,
+    the time spent importing modules and in each phase of the command is printed to stderr. """
+
+    argv = list(sys.argv if argv is None else argv)
+
+    if '--startup-profile' in argv:
+        argv.remove('--startup-profile')
+        startup_profile = True
+    elif startup_profile is None:
+        startup_profile = bool(os.environ.get('RPY_STARTUP_PROFILE'))
+
+    if not startup_profile:
+        return DispatchCommand(argv).main()
+
+    profile = startup.enable()
+    try:
+        return DispatchCommand(argv).main()
+    finally:
+        startup.report(profile)
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import json
+import os
+import sys
+import zlib
+
+import rpy
+from rpy.cli.utils import discover_with_convention
+from rpy.functions.importutils import module_path
+from rpy.functions.process import user_cache_path
+
+
+def default_manifest_path(modules, class_name):
+    """ Return the path of the manifest for `modules`, inside :code:`$XDG_CACHE_HOME/rpy`.
+    The path can be overridden by setting :code:`RPY_COMMANDS_MANIFEST`, an empty value disables the manifest. 
+
+    The folders of `modules` are part of the path, so that copies of the same package run by one interpreter do not share a manifest. """
+    try:
+        return os.environ['RPY_COMMANDS_MANIFEST'] or None
+    except KeyError:
+        pass
+
+    digest = '%08x' % zlib.crc32(
+        json.dumps([sys.executable, list(modules), module_paths(modules), class_name]).encode('utf-8'))
+
+    return user_cache_path('commands-%s.json' % digest)
+
+
+def module_paths(modules):
+    return [module_path(module) for module in modules]
+
+
+class CommandManifest(object):
+    """ A persisted map from command names to dotted paths, to avoid walking the commands folders on every run.
+
+    The manifest stores the mtime of every folder that was walked, adding or removing a command changes the mtime of its folder.
+    When the version of rpy, the folders of the modules or any of the mtimes changed, the folders are walked again and the manifest is rewritten.
+    Commands added with :meth:`register` are kept across rebuilds.
+    """
+
+    def __init__(self, modules, class_name, path=None):
+        self.modules = tuple(modules)
+        self.class_name = class_name
+        self.path = path or default_manifest_path(self.modules, class_name)
+
+    def read(self):
+        if not self.path:
+            return None
+        try:
+            with open(self.path, 'r') as stream:
+                return json.load(stream)
+        except (OSError, ValueError):
+            return None
+
+    def write(self, manifest):
+        if not self.path:
+            return manifest
+        import tempfile
+
+        try:
+            folder = os.path.dirname(self.path)
+            os.makedirs(folder, exist_ok=True)
+            #write and rename, so that a concurrent run never reads a partial manifest
+            fd, temp = tempfile.mkstemp(dir=folder, suffix='.tmp')
+            with os.fdopen(fd, 'w') as stream:
+                json.dump(manifest, stream)
+            os.replace(temp, self.path)
+        except OSError:
+            #the cache folder is not writable, the manifest is rebuilt on every run
+            pass
+        return manifest
+
+    def is_valid(self, manifest):
+        if not isinstance(manifest, dict) or not manifest.get('version') == rpy.__version__:
+            return False
+        if not manifest.get('modules') == module_paths(self.modules):
+            return False
+        try:
+            return all(
+                os.stat(folder).st_mtime_ns == mtime
+                for folder, mtime in manifest['folders'].items()
+            )
+        except (OSError, KeyError, AttributeError):
+            return False
+
+    def rebuild(self, extra=None):
+        folders = []
+        commands = discover_with_convention(self.modules, self.class_name, folders=folders)
+        return self.write({
+            'version': rpy.__version__,
+            'modules': module_paths(self.modules),
+            'folders': dict((folder, os.stat(folder).st_mtime_ns) for folder in folders),
+            'commands': commands,
+            'extra': extra or {},
+        })
+
+    def load(self):
+        manifest = self.read()
+        if not self.is_valid(manifest):
+            manifest = self.rebuild(extra=isinstance(manifest, dict) and manifest.get('extra') or None)
+        return manifest
+
+    def commands(self):
+        """ Return a dict from command names to dotted paths, including registered commands. """
+        manifest = self.load()
+        commands = dict(manifest['commands'])
+        commands.update(manifest['extra'])
+        return commands
+
+    def register(self, name, dotted_path):
+        """ Add a command from outside the commands folders, i.e. :code:`register('deploy', 'myproject.deploy.Command')`. """
+        manifest = self.load()
+        manifest['extra'][name] = dotted_path
+        self.write(manifest)
+
+    def unregister(self, name):
+        manifest = self.load()
+        manifest['extra'].pop(name, None)
+        self.write(manifest)
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import sys
+import time
+from contextlib import contextmanager
+
+#this module is imported before the import hook is installed, it must only import modules that are already loaded at startup
+
+_profile = None
+
+
+class StartupProfile(object):
+    """ Timings of imports and of the phases of a command, collected by :func:`enable`. """
+
+    def __init__(self):
+        self.imports = []
+        self.phases = []
+        self.stack = []
+        self.started = time.perf_counter()
+
+    def timed_import(self, name, function, *args):
+        self.stack.append(0.)
+        t = time.perf_counter()
+        try:
+            return function(*args)
+        finally:
+            total = time.perf_counter() - t
+            children = self.stack.pop()
+            if self.stack:
+                self.stack[-1] += total
+            self.imports.append((name, len(self.stack), total - children, total))
+
+    def import_tree(self):
+        #records are appended when an import completes, children are completed before their parent
+        pending = {}
+        for name, depth, self_time, total in self.imports:
+            node = (name, self_time, total, pending.pop(depth + 1, []))
+            pending.setdefault(depth, []).append(node)
+        return pending.get(0, [])
+
+
+class _TimedLoader(object):
+
+    def __init__(self, loader, profile):
+        self.loader = loader
+        self.profile = profile
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        return self.profile.timed_import(module.__name__, self.loader.exec_module, module)
+
+    def __getattr__(self, attr):
+        return getattr(self.loader, attr)
+
+
+class _TimedFinder(object):
+
+    def __init__(self, profile):
+        self.profile = profile
+
+    def find_spec(self, name, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is not None:
+                if hasattr(spec.loader, 'exec_module'):
+                    spec.loader = _TimedLoader(spec.loader, self.profile)
+                return spec
+        return None
+
+
+def enable():
+    """ Start timing imports and phases, returning the current :class:`StartupProfile`. """
+    global _profile
+    if _profile is None:
+        _profile = StartupProfile()
+        sys.meta_path.insert(0, _TimedFinder(_profile))
+    return _profile
+
+
+def disable():
+    global _profile
+    sys.meta_path[:] = [finder for finder in sys.meta_path if not isinstance(finder, _TimedFinder)]
+    profile, _profile = _profile, None
+    return profile
+
+
+@contextmanager
+def phase(name):
+    """ Record the time spent in the block as phase `name`, when profiling is enabled. """
+    if _profile is None:
+        yield
+        return
+    t = time.perf_counter()
+    try:
+        yield
+    finally:
+        _profile.phases.append((name, time.perf_counter() - t))
+
+
+def _external(node):
+    #imports of other packages done by an rpy module are reported as a single line
+    name, self_time, total, children = node
+    return not name.split('.')[0] == 'rpy'
+
+
+def _print_imports(nodes, write, indent=1):
+    for node in nodes:
+        name, self_time, total, children = node
+        if _external(node):
+            continue
+        external = [child for child in children if _external(child)]
+        write('%s%-*s %9.3f %9.3f %9.3f  %s' % (
+            '  ' * indent,
+            40 - 2 * indent,
+            name,
+            total * 1000,
+            self_time * 1000,
+            sum(child[2] for child in external) * 1000,
+            ', '.join(child[0] for child in sorted(external, key=lambda child: -child[2])[:3])
+        ))
+        _print_imports(children, write, indent + 1)
+
+
+def report(profile=None, stream=None):
+    """ Print import times aggregated per rpy module, the time of each :class:`~rpy.functions.importutils.API` name and of each phase. """
+    profile = profile or _profile
+    stream = stream or sys.stderr
+
+    def write(line):
+        print(line, file=stream)
+
+    write('Startup profile, %.3f ms since the profile was enabled' % ((time.perf_counter() - profile.started) * 1000))
+
+    write('Phases (ms):')
+    for name, elapsed in profile.phases:
+        write('  %-38s %9.3f' % (name, elapsed * 1000))
+
+    tree = profile.import_tree()
+    external = [node for node in tree if _external(node)]
+    write('Imports (ms):')
+    write('  %-38s %9s %9s %9s  %s' % ('module', 'total', 'self', 'external', 'slowest external'))
+    _print_imports(tree, write)
+    write('  %-38s %9.3f' % ('other top level imports', sum(node[2] for node in external) * 1000))
+
+    from rpy.functions.importutils import API
+
+    write('API (ms):')
+    seen = set()
+    for module_name, module in sorted(tuple(sys.modules.items())):
+        if not module_name.split('.')[0] == 'rpy' or module is None:
+            continue
+        for attr, api in sorted(vars(module).items()):
+            if isinstance(api, API) and not id(api) in seen:
+                seen.add(id(api))
+                for record in api.stats():
+                    write('  %-38s %9.3f  %s' % (
+                        '%s.%s' % (attr, record.name),
+                        record.time * 1000,
+                        record.error and 'error: %s' % record.error or record.path or ''))
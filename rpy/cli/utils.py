@@ -2,10 +2,10 @@
 
 from __future__ import absolute_import, print_function, unicode_literals
 
-import argparse
 import os
 import sys
 
+from rpy.cli import startup
 from rpy.functions.decorators import to_dict
 from rpy.functions.importutils import module_path
 from rpy.functions.require import require_module
@@ -24,8 +24,10 @@ else:
             yield os.path.isdir(os.path.join(folder, f)), f
 
 
-def _discover(module, folder=None, walk=True):
+def _discover(module, folder=None, walk=True, folders=None):
     folder = folder or module_path(module)
+    if folders is not None:
+        folders.append(folder)
     for is_folder, filename in _scan(folder):
         if not is_folder:
             yield module, filename
@@ -33,14 +35,17 @@ def _discover(module, folder=None, walk=True):
             for args in _discover(
                     '%s.%s' % (module, filename),
                     folder=os.path.join(folder, filename),
-                    walk=walk):
+                    walk=walk,
+                    folders=folders):
                 yield args
 
 
 @to_dict
-def discover_with_convention(modules, import_name, walk=True):
+def discover_with_convention(modules, import_name, walk=True, folders=None):
+    """ Return a dict from module basenames to dotted paths of `import_name` in each module.
+    When `folders` is a list, every folder that was scanned is appended to it. """
     for module in modules:
-        for module, filename in _discover(module, walk=walk):
+        for module, filename in _discover(module, walk=walk, folders=folders):
             basename, ext = os.path.splitext(filename)
             if ext == '.py' and not basename == '__init__':
                 yield basename, '%s.%s.%s' % (module, basename, import_name)
@@ -53,6 +58,9 @@ class SimpleCommand(object):
 
     dependencies = ()
 
+    #pairs of (API, names) imported in background while arguments are parsed
+    preload = ()
+
     def __init__(self, argv=None, name=None):
         if argv is None:
             self.argv = tuple(sys.argv)
@@ -62,6 +70,7 @@ class SimpleCommand(object):
         self.name = name
 
     def create_parser(self):
+        import argparse
         return argparse.ArgumentParser(prog=self.name, description=self.help)
 
     def add_arguments(self, parser):
@@ -72,15 +81,22 @@ class SimpleCommand(object):
 
     def main(self):
 
-        if self.dependencies:
-            require_module(*self.dependencies)
+        with startup.phase('dependencies'):
+            if self.dependencies:
+                require_module(*self.dependencies)
 
-        parser = self.create_parser()
-        if parser:
-            self.add_arguments(parser)
+            for api, names in self.preload:
+                api.preload(*names)
 
-            cmd_options = vars(parser.parse_args(self.argv[1:]))
-            args = cmd_options.pop('args', ())
-            return self.handle(*args, **cmd_options)
+        with startup.phase('argparse'):
+            parser = self.create_parser()
+            if parser:
+                self.add_arguments(parser)
 
-        return self.handle()
+                cmd_options = vars(parser.parse_args(self.argv[1:]))
+                args = cmd_options.pop('args', ())
+            else:
+                cmd_options, args = {}, ()
+
+        with startup.phase('handle'):
+            return self.handle(*args, **cmd_options)
@@ -2,8 +2,12 @@
 
 from __future__ import absolute_import, print_function, unicode_literals
 
+import re
+
 from rpy.functions import six
 from rpy.functions.datastructures import data
+from rpy.functions.debug import instrument
+from rpy.functions.encoding import StreamDecoder, iter_decode
 from rpy.functions.importutils import import_string_and_call
 
 
@@ -26,6 +30,7 @@ def UnicodeReader(f, **opts):
 def UnicodeWriter(f, **opts):
     return import_string_and_call('unicodecsv.py%i.UnicodeWriter' % (six.PY2 and 2 or 3), f, **fixargs(opts))
 
+@instrument()
 def get_csv_rows(path, **kwargs):
     if isinstance(path, six.string_types):
         with open(path, six.PY2 and "r" or "rb") as f:
@@ -44,6 +49,7 @@ def get_csv_dicts(path, header_processor = None, data_processor = data, **kwargs
         for line in lines
     )
 
+@instrument()
 def write_to_stream(lines, stream = None, **opts):
     s = stream or six.BytesIO()
     writer = UnicodeWriter(s, **opts)
@@ -52,3 +58,186 @@ def write_to_stream(lines, stream = None, **opts):
     if hasattr(s, 'seek'):
         s.seek(0)
     return s
+
+
+def _iter_lines(chunks):
+    #splits text chunks in lines keeping the line endings, like a file opened with newline=''
+    pending = []
+    for chunk in chunks:
+        if not '\n' in chunk:
+            pending.append(chunk)
+            continue
+        lines = chunk.split('\n')
+        lines[0] = ''.join(pending) + lines[0]
+        pending = [lines.pop()]
+        for line in lines:
+            yield line + '\n'
+    if any(pending):
+        yield ''.join(pending)
+
+@instrument()
+def iter_csv_rows(chunks, encoding='utf-8', errors='strict', sniff_bom=True, **kwargs):
+    """ Yield rows parsed from an iterable of byte chunks, i.e. :func:`~rpy.functions.encoding.iter_chunks` of a file or a pipe.
+
+    Only one chunk and one row are kept in memory, chunks are decoded by :func:`~rpy.functions.encoding.iter_decode`. """
+    import csv
+    yield from csv.reader(
+        _iter_lines(iter_decode(chunks, encoding, errors, sniff_bom)), **fixargs(kwargs))
+
+
+class _Records(object):
+    #splits decoded text at the last newline that is not inside a quoted field.
+    #a newline ends a record when the number of quotes before it is even, quotes are counted incrementally.
+    #with an escapechar, escaped characters are replaced in a masked copy of the text, so that an escaped quote
+    #or newline is not counted, and an escaped escapechar does not escape the quote following it.
+
+    def __init__(self, quotechar='"', escapechar=None, quoting=0):
+        self.quotechar = not quoting == 3 and quotechar or None
+        self.escapechar = escapechar
+        self.escaped = escapechar and re.compile(re.escape(escapechar) + '.', re.DOTALL) or None
+        self.buffer = ''
+        self.masked = ''
+        self.quotes = 0
+        self.pending_escape = False
+
+    def mask(self, text):
+        if not self.escaped or not text:
+            return text
+        if self.pending_escape:
+            #the previous text ended with an escapechar, which escapes the first character
+            masked = '\0' + self.escaped.sub('\0\0', text[1:])
+        else:
+            masked = self.escaped.sub('\0\0', text)
+        self.pending_escape = masked.endswith(self.escapechar)
+        return masked
+
+    def feed(self, text, final=False):
+        start = len(self.buffer)
+        self.buffer += text
+
+        if final:
+            records, self.buffer, self.masked, self.quotes, self.pending_escape = self.buffer, '', '', 0, False
+            return records
+
+        masked = self.mask(text)
+        self.masked += masked
+        if self.quotechar:
+            self.quotes += masked.count(self.quotechar)
+
+        quotes = self.quotes
+        end = len(self.masked)
+        while True:
+            newline = self.masked.rfind('\n', start, end)
+            if newline < 0:
+                return ''
+            if self.quotechar:
+                quotes -= self.masked.count(self.quotechar, newline + 1, end)
+            if not quotes % 2:
+                break
+            end = newline
+
+        records, self.buffer = self.buffer[:newline + 1], self.buffer[newline + 1:]
+        self.masked = self.masked[newline + 1:]
+        self.quotes -= quotes
+        return records
+
+
+_eof = object()
+
+
+async def _read_chunks(source, chunk_size, queue):
+    import inspect
+    from rpy.functions.asyncio import run_in_thread
+
+    stream = None
+    try:
+        if isinstance(source, six.string_types):
+            stream = await run_in_thread(open, source, 'rb')
+            source = stream
+
+        if inspect.iscoroutinefunction(source.read):
+            read = source.read
+        else:
+            async def read(size):
+                return await run_in_thread(source.read, size)
+
+        while True:
+            chunk = await read(chunk_size)
+            if not chunk:
+                break
+            await queue.put(chunk)
+
+        await queue.put(_eof)
+    except Exception as e:
+        await queue.put(e)
+    finally:
+        if stream is not None:
+            stream.close()
+
+
+async def aget_csv_rows(source, chunk_size=1024 * 1024, max_pending=4, batch=False, encoding='utf-8', errors='strict', sniff_bom=True, **kwargs):
+    """ Same as :func:`get_csv_rows` for asyncio code, `source` is a path, a file or an :class:`asyncio.StreamReader`.
+
+    The source is read in chunks of `chunk_size`, files in the thread pool of the loop, and parsed by :mod:`csv` as chunks arrive.
+    At most `max_pending` chunks are read ahead of the rows consumed, reading waits for the consumer.
+    With :code:`batch=True` a list of rows is yielded for each chunk instead of single rows.
+    Bytes are decoded by :class:`~rpy.functions.encoding.StreamDecoder`.
+    """
+    import asyncio
+    import csv
+    import io
+
+    kwargs = fixargs(kwargs)
+    records = _Records(
+        kwargs.get('quotechar', '"'), kwargs.get('escapechar', None), kwargs.get('quoting', csv.QUOTE_MINIMAL))
+    decoder = StreamDecoder(encoding, errors, sniff_bom)
+
+    queue = asyncio.Queue(max_pending)
+    reader = asyncio.ensure_future(_read_chunks(source, chunk_size, queue))
+
+    try:
+        while True:
+            chunk = await queue.get()
+
+            if chunk is _eof:
+                text = records.feed(decoder.decode(b'', final=True), final=True)
+            elif isinstance(chunk, BaseException):
+                raise chunk
+            elif isinstance(chunk, six.binary_type):
+                text = records.feed(decoder.decode(chunk))
+            else:
+                text = records.feed(chunk)
+
+            if text:
+                rows = list(csv.reader(io.StringIO(text, newline=''), **kwargs))
+                if batch:
+                    yield rows
+                else:
+                    for row in rows:
+                        yield row
+
+            if chunk is _eof:
+                return
+    finally:
+        reader.cancel()
+        await asyncio.wait((reader, ))
+
+
+async def aget_csv_dicts(source, header_processor = None, data_processor = data, batch=False, **kwargs):
+    """ Same as :func:`get_csv_dicts` for asyncio code, see :func:`aget_csv_rows`. """
+    headers = None
+    async for rows in aget_csv_rows(source, batch=True, **kwargs):
+        if headers is None and rows:
+            headers = rows[0]
+            if header_processor:
+                headers = tuple(map(header_processor, headers))
+            rows = rows[1:]
+
+        dicts = [data_processor(zip(headers, row)) for row in rows]
+        if batch:
+            if dicts:
+                yield dicts
+        else:
+            for d in dicts:
+                yield d
+
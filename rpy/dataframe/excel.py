@@ -7,9 +7,10 @@ from decimal import Decimal
 from itertools import count, islice, product, repeat
 
 from rpy.functions import six
+from rpy.functions.debug import instrument
 from rpy.functions.decorators import to_tuple
 from rpy.functions.dispatch import Dispatch
-from rpy.functions.encoding import force_text
+from rpy.functions.encoding import force_text, force_text_many
 
 XLSX_MYMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
 
@@ -44,7 +45,7 @@ def handle(self, value, y, x):
 
 @write.dispatch((tuple, list, set, frozenset))
 def handle(self, value, y, x):
-    return write(self, "-".join([force_text(v) for v in value]), y, x)
+    return write(self, "-".join(force_text_many(value)), y, x)
 
 @write.dispatch(datetime.timedelta)
 def handle(self, value, y, x):
@@ -105,6 +106,8 @@ def handle(self, value, y, x):
     self.update_max_size(x, len(value))
     return self.worksheet.write(y, x, value)
 
+write.freeze()
+
 class XLSXWriter(object):
 
     def __init__(self, f, name = 'Workbook', freeze_rows = 1, auto_sizing = True):
@@ -166,6 +169,7 @@ class XLSXWriter(object):
 
     write = write.as_method()
 
+    @instrument()
     def writerow(self, row):
         for y, value in enumerate(row):
             self.write(value, self.line, y)
@@ -181,6 +185,7 @@ class XLSXWriter(object):
         self.close_worksheet()
         self.workbook.close()
 
+@instrument()
 def write_to_stream(lines, stream = None, **opts):
     s = stream or six.BytesIO()
     if not isinstance(lines, dict):
@@ -35,6 +35,9 @@ fernet = API(
 
 asyncio = API(
     wait = 'asyncio.wait',
+    wait_for = 'asyncio.wait_for',
+    FIRST_COMPLETED = 'asyncio.FIRST_COMPLETED',
+    CancelledError = 'asyncio.CancelledError',
     gather = 'asyncio.gather',
     ensure_future = 'asyncio.ensure_future',
     get_event_loop = 'asyncio.get_event_loop',
@@ -2,21 +2,93 @@
 
 from __future__ import absolute_import, print_function, unicode_literals
 
-from operator import methodcaller
+import weakref
+from functools import partial
 
 from rpy.functions.api import asyncio
-from rpy.functions.decorators import to_tuple
-from rpy.functions.functional import first, iterate
+from rpy.functions.functional import iterate
 
+#executors by loop, removed and shut down when the loop is garbage collected
+_executors = weakref.WeakKeyDictionary()
 
-async def _id(id, task):
-    return id, await task
 
-async def wait_all(*args):
-    return await asyncio.gather(*iterate(*args))
+def _retrieve(tasks):
+    #exceptions of tasks that are not reported are marked as retrieved, to avoid warnings when the tasks are destroyed
+    for task in tasks:
+        if task.done() and not task.cancelled():
+            task.exception()
 
-def run_all(*args, **opts):
-    return asyncio.ensure_future(wait_all(*args), **opts)
+
+async def as_completed_all(*args, concurrency=None, timeout=None, errors='raise'):
+    """ Await all the awaitables yielded by :func:`~rpy.functions.functional.iterate`, yielding :code:`(index, result)` pairs as they complete.
+
+    Tasks are created lazily, at most `concurrency` are running at the same time, and the input is not read further ahead.
+    Each awaitable is cancelled after `timeout` seconds, raising :class:`asyncio.TimeoutError`.
+
+    With :code:`errors='raise'` the first exception is raised and the remaining tasks are cancelled.
+    With :code:`errors='return'` exceptions are yielded as results.
+    """
+
+    if not errors in ('raise', 'return'):
+        raise ValueError("errors must be 'raise' or 'return', got %s" % errors)
+
+    items = enumerate(iterate(*args))
+    exhausted = False
+    indexes = {}
+    pending = set()
+
+    try:
+        while True:
+
+            while not exhausted and (concurrency is None or len(pending) < concurrency):
+                try:
+                    index, awaitable = next(items)
+                except StopIteration:
+                    exhausted = True
+                else:
+                    if timeout is not None:
+                        awaitable = asyncio.wait_for(awaitable, timeout)
+                    task = asyncio.ensure_future(awaitable)
+                    indexes[task] = index
+                    pending.add(task)
+
+            if not pending:
+                return
+
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+            for task in sorted(done, key=indexes.get):
+                index = indexes.pop(task)
+                if task.cancelled():
+                    error = asyncio.CancelledError()
+                else:
+                    error = task.exception()
+
+                if error is None:
+                    yield index, task.result()
+                elif errors == 'raise':
+                    _retrieve(done)
+                    raise error
+                else:
+                    yield index, error
+
+    finally:
+        if pending:
+            for task in pending:
+                task.cancel()
+            await asyncio.wait(pending)
+            _retrieve(pending)
+
+
+async def wait_all(*args, **opts):
+    """ Await all the awaitables, returning a list of results in input order. Accepts the options of :func:`as_completed_all`. """
+    results = {}
+    async for index, result in as_completed_all(*args, **opts):
+        results[index] = result
+    return [results[index] for index in range(len(results))]
+
+def run_all(*args, loop=None, **opts):
+    return asyncio.ensure_future(wait_all(*args, **opts), loop=loop)
 
 def get_event_loop(loop=None):
     try:
@@ -26,6 +98,101 @@ def get_event_loop(loop=None):
         asyncio.set_event_loop(loop)
         return loop
 
-@to_tuple
-def syncronous_wait_all(*args, loop=None):
-    yield from (loop or get_event_loop()).run_until_complete(wait_all(*args))
+def _shutdown(executors, wait=False):
+    for executor in tuple(executors.values()):
+        executor.shutdown(wait=wait)
+    executors.clear()
+
+_thread_pool_class = None
+
+def _thread_pool(executors, workers):
+    #the thread pool is the default executor of the loop, it's shut down by loop.close and loop.shutdown_default_executor,
+    #which also shut down the process pool of the loop through it
+    global _thread_pool_class
+
+    if _thread_pool_class is None:
+        from concurrent.futures import ThreadPoolExecutor
+
+        class LoopThreadPool(ThreadPoolExecutor):
+
+            def __init__(self, executors, workers):
+                super(LoopThreadPool, self).__init__(workers, thread_name_prefix='rpy-asyncio')
+                self.executors = executors
+
+            def shutdown(self, wait=True, **opts):
+                super(LoopThreadPool, self).shutdown(wait=wait, **opts)
+                process = self.executors.pop('process', None)
+                if process is not None:
+                    process.shutdown(wait=wait, **opts)
+
+        _thread_pool_class = LoopThreadPool
+
+    return _thread_pool_class(executors, workers)
+
+def get_executor(loop=None, process=False, workers=None):
+    """ Return the thread pool, or the process pool, owned by `loop`, creating it with `workers` workers on first use.
+
+    The thread pool is also the default executor of the loop. Both pools are shut down by :meth:`asyncio.loop.close`,
+    which does not wait for running calls, by :meth:`asyncio.loop.shutdown_default_executor` and :func:`shutdown_executors`, which wait,
+    or when the loop is garbage collected. """
+    loop = loop or asyncio.get_event_loop()
+    kind = process and 'process' or 'thread'
+
+    try:
+        executors = _executors[loop]
+    except KeyError:
+        executors = _executors[loop] = {}
+        weakref.finalize(loop, _shutdown, executors)
+
+    try:
+        return executors[kind]
+    except KeyError:
+        pass
+
+    if process:
+        from concurrent.futures import ProcessPoolExecutor
+        #the process pool is shut down with the thread pool, which must exist
+        get_executor(loop)
+        executor = ProcessPoolExecutor(workers)
+    else:
+        executor = _thread_pool(executors, workers)
+        loop.set_default_executor(executor)
+
+    executors[kind] = executor
+    return executor
+
+async def shutdown_executors(loop=None):
+    """ Shut down the pools owned by `loop`, waiting for running calls without blocking the loop. """
+    loop = loop or asyncio.get_event_loop()
+    executors = _executors.pop(loop, None)
+    if not executors:
+        return
+
+    #shutdown is waiting in a dedicated thread, a thread of the pool cannot wait for itself
+    import threading
+
+    done = loop.create_future()
+
+    def shutdown():
+        try:
+            _shutdown(executors, wait=True)
+        finally:
+            loop.call_soon_threadsafe(done.set_result, None)
+
+    threading.Thread(target=shutdown, name='rpy-asyncio-shutdown').start()
+    await done
+
+async def run_in_thread(function, *args, **opts):
+    """ Call a blocking function in the thread pool of the running loop, see :func:`get_executor`. """
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(
+        get_executor(loop), partial(function, *args, **opts))
+
+async def run_in_process(function, *args, **opts):
+    """ Call a picklable function in the process pool of the running loop, for CPU bound work, see :func:`get_executor`. """
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(
+        get_executor(loop, process=True), partial(function, *args, **opts))
+
+def syncronous_wait_all(*args, loop=None, **opts):
+    return tuple((loop or get_event_loop()).run_until_complete(wait_all(*args, **opts)))
@@ -2,6 +2,11 @@
 
 from __future__ import absolute_import, print_function, unicode_literals
 
+import math
+import os
+from collections.abc import Sequence
+from decimal import Decimal
+
 
 class data(dict):
     def __getattr__(self, attr):
@@ -16,3 +21,222 @@ class data(dict):
 
     def __delattr__(self, attr):
         return self.__delattr__(attr)
+
+
+class SequenceView(Sequence):
+    """ A read only view of `sequence` between `start` and `stop`, items are not copied. """
+
+    __slots__ = ('sequence', 'range')
+
+    def __init__(self, sequence, start=0, stop=None):
+        self.sequence = sequence
+        self.range = range(len(sequence))[start:stop]
+
+    def __len__(self):
+        return len(self.range)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            view = SequenceView.__new__(SequenceView)
+            view.sequence = self.sequence
+            view.range = self.range[index]
+            return view
+        return self.sequence[self.range[index]]
+
+    def __iter__(self):
+        return map(self.sequence.__getitem__, self.range)
+
+    def __eq__(self, other):
+        if isinstance(other, (SequenceView, list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __ne__(self, other):
+        value = self.__eq__(other)
+        if value is NotImplemented:
+            return value
+        return not value
+
+    def __repr__(self):
+        return '<%s %s>' % (self.__class__.__name__, list(self))
+
+
+def _normalize_key(key):
+    #keys that compare equal must be encoded to the same bytes, True, 1.0 and Decimal(1) are encoded as 1
+    cls = key.__class__
+    if cls is tuple:
+        return tuple(map(_normalize_key, key))
+    if cls is bool:
+        return int(key)
+    if cls is complex and not key.imag:
+        key, cls = key.real, float
+    if cls is float and math.isfinite(key) and key.is_integer():
+        return int(key)
+    if cls is Decimal and key.is_finite():
+        if key == key.to_integral_value():
+            return int(key)
+        if float(key) == key:
+            return float(key)
+    return key
+
+
+_dumps = None
+
+
+def _encode_key(key):
+    #pickle is resolved on the first call, this module is imported by the command line
+    global _dumps
+    if _dumps is None:
+        import pickle
+        _dumps = pickle.dumps
+    return _dumps(_normalize_key(key), 4)
+
+
+class SpillSet(object):
+    """ A set that moves its keys to a sqlite database on disk once it holds more than `threshold` keys.
+
+    Only :meth:`add`, :code:`in` and :func:`len` are supported. Keys are stored on disk using `encode`, 
+    keys that compare equal must be encoded to the same bytes. The default encoder pickles keys after converting
+    numbers that are equal to an int, such as :data:`True` and 1.0, and tuples of them, so that they are stored as the same key.
+    The database is created in a temporary file, unless `path` is given, and removed by :meth:`close`.
+    A database at `path` is kept, the set always starts empty and keys left by a previous run are deleted when keys are spilled.
+    Keys added to a database at `path` are committed every `batch_size` keys and by :meth:`close`.
+    :meth:`add` returns whether the key was new, so that checking and adding is a single query.
+    """
+
+    add_returns_new = True
+
+    def __init__(self, threshold=1000000, path=None, encode=_encode_key, batch_size=10000):
+        self.threshold = threshold
+        self.path = path
+        self.encode = encode
+        self.batch_size = batch_size
+        self.memory = set()
+        self.connection = None
+        self.size = 0
+        self.pending = 0
+
+    def spill(self):
+        import sqlite3
+        import tempfile
+
+        if self.path is None:
+            fd, self.path = tempfile.mkstemp(suffix='.sqlite')
+            os.close(fd)
+            self.temporary = True
+        else:
+            self.temporary = False
+
+        #the rollback journal is kept in memory, without one a rollback could corrupt the database
+        self.connection = sqlite3.connect(self.path, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=MEMORY')
+        self.connection.execute('PRAGMA synchronous=OFF')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS keys (key BLOB PRIMARY KEY) WITHOUT ROWID')
+        self.connection.execute('BEGIN')
+        self.connection.execute('DELETE FROM keys')
+        self.connection.executemany(
+            'INSERT OR IGNORE INTO keys VALUES (?)', 
+            ((self.encode(key), ) for key in self.memory)
+        )
+        self.commit()
+        self.memory = set()
+
+    def commit(self):
+        if self.connection is not None and self.connection.in_transaction:
+            self.connection.execute('COMMIT')
+        self.pending = 0
+
+    def add(self, key):
+        if self.connection is None:
+            if not key in self.memory:
+                self.memory.add(key)
+                self.size += 1
+                if self.size > self.threshold:
+                    self.spill()
+                return True
+            return False
+
+        #inserts are grouped in transactions, committing each key would sync the file every time
+        if not self.connection.in_transaction:
+            self.connection.execute('BEGIN')
+        new = self.connection.execute(
+            'INSERT OR IGNORE INTO keys VALUES (?)', (self.encode(key), )).rowcount > 0
+        if new:
+            self.size += 1
+        self.pending += 1
+        if self.pending >= self.batch_size:
+            self.commit()
+        return new
+
+    def __contains__(self, key):
+        if self.connection is None:
+            return key in self.memory
+        return self.connection.execute(
+            'SELECT 1 FROM keys WHERE key = ?', (self.encode(key), )).fetchone() is not None
+
+    def __len__(self):
+        return self.size
+
+    def close(self):
+        if self.connection is not None:
+            self.commit()
+            self.connection.close()
+            self.connection = None
+            if self.temporary:
+                os.remove(self.path)
+                self.path = None
+        self.memory = set()
+        self.size = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, tb):
+        self.close()
+
+
+class BloomFilter(object):
+    """ An approximate set using a fixed amount of memory. 
+
+    A key that was added is always found, a key that was not added is found with a probability close to `error_rate` 
+    as long as less than `capacity` keys are added. Only :meth:`add` and :code:`in` are supported.
+    :meth:`add` returns whether the key was new, with the same error rate as :code:`in`.
+    """
+
+    add_returns_new = True
+
+    def __init__(self, capacity=1000000, error_rate=0.001, encode=_encode_key):
+        if not 0 < error_rate < 1:
+            raise ValueError('error_rate must be between 0 and 1, got %s' % error_rate)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.encode = encode
+        self.size = int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+
+        import hashlib
+        self.blake2b = hashlib.blake2b
+
+    def positions(self, key):
+        digest = self.blake2b(self.encode(key), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return tuple((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key):
+        bits = self.bits
+        new = False
+        for position in self.positions(key):
+            mask = 1 << (position & 7)
+            if not bits[position >> 3] & mask:
+                bits[position >> 3] |= mask
+                new = True
+        return new
+
+    def __contains__(self, key):
+        bits = self.bits
+        for position in self.positions(key):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
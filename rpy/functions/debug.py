@@ -2,9 +2,15 @@
 
 from __future__ import absolute_import, print_function, unicode_literals
 
+import math
+import os
+import sys
+import threading
 import time
 from functools import wraps
 
+from rpy.functions.datastructures import data
+
 
 def timed(function):
     def inner(*args, **opts):
@@ -23,10 +29,229 @@ def echo(x):
 def print_elapsed_time(viewfunc):
     @wraps(viewfunc)
     def inner(*args, **kw):
-        t, res = timed(viewfunc)(*args, **kw)
-        print("Done %s: %s sec" % (viewfunc.__name__,
-                                   Decimal(time.perf_counter() - t).quantize(
-                                       Decimal("0.000000"))))
+        elapsed, res = timed(viewfunc)(*args, **kw)
+        print("Done %s: %.6f sec" % (viewfunc.__name__, elapsed))
         return res
 
     return inner
+
+
+class Timings(object):
+    """ Count, total, min, max and an approximate distribution of the durations recorded with the same name.
+
+    Durations are counted in logarithmic buckets, each `precision` wide in relative terms,
+    so that percentiles use constant memory and have a relative error below `precision`. """
+
+    def __init__(self, name, precision=0.05):
+        self.name = name
+        self.scale = 1 / math.log1p(precision)
+        self.base = 1 + precision
+        self.count = 0
+        self.total = 0.
+        self.min = None
+        self.max = None
+        self.buckets = {}
+
+    def add(self, elapsed):
+        self.count += 1
+        self.total += elapsed
+        if self.min is None or elapsed < self.min:
+            self.min = elapsed
+        if self.max is None or elapsed > self.max:
+            self.max = elapsed
+        bucket = math.floor(math.log(max(elapsed, 1e-9)) * self.scale)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def percentile(self, q):
+        if not self.count:
+            return None
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= q / 100 * self.count:
+                #the center of the bucket, clipped to the values that were seen
+                return min(self.max, max(self.min, self.base ** (bucket + 0.5)))
+        return self.max
+
+    def info(self):
+        return data(
+            name = self.name,
+            count = self.count,
+            total = self.total,
+            mean = self.count and self.total / self.count or None,
+            min = self.min,
+            max = self.max,
+            p50 = self.percentile(50),
+            p90 = self.percentile(90),
+            p99 = self.percentile(99),
+        )
+
+
+class _Timer(object):
+
+    def __init__(self, registry, name):
+        self.registry = registry
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, type, value, tb):
+        self.registry.record(self.name, time.perf_counter() - self.started)
+
+
+class _NoTimer(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, tb):
+        pass
+
+
+_no_timer = _NoTimer()
+
+
+class TimingRegistry(object):
+    """ Collects durations by name, from :meth:`timer` blocks and :meth:`instrument` functions.
+
+    Recording is thread safe, and coroutines are timed from the call until they return, including the time spent awaiting.
+    When the registry is disabled :meth:`timer` returns a shared no-op context manager and :meth:`instrument` returns the function unchanged,
+    so instrumentation can stay in production code. Functions instrumented while disabled are not timed after :meth:`enable`.
+    """
+
+    def __init__(self, enabled=True, precision=0.05):
+        self.enabled = enabled
+        self.precision = precision
+        self.lock = threading.Lock()
+        self.timings = {}
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def record(self, name, elapsed):
+        with self.lock:
+            try:
+                timings = self.timings[name]
+            except KeyError:
+                timings = self.timings[name] = Timings(name, self.precision)
+            timings.add(elapsed)
+
+    def timer(self, name):
+        """ A context manager recording the time spent in the block as `name`. """
+        if not self.enabled:
+            return _no_timer
+        return _Timer(self, name)
+
+    def instrument(self, name=None):
+        """ A decorator recording the duration of every call, by default as the qualified name of the function.
+
+        For generator functions the time spent producing items is recorded when the generator is exhausted or closed. """
+
+        def decorator(function):
+            if not self.enabled:
+                return function
+
+            import inspect
+
+            label = name or '%s.%s' % (function.__module__, function.__qualname__)
+
+            if inspect.iscoroutinefunction(function):
+
+                @wraps(function)
+                async def wrapper(*args, **opts):
+                    t = time.perf_counter()
+                    try:
+                        return await function(*args, **opts)
+                    finally:
+                        self.record(label, time.perf_counter() - t)
+
+            elif inspect.isgeneratorfunction(function):
+
+                @wraps(function)
+                def wrapper(*args, **opts):
+                    elapsed = 0.
+                    iterator = function(*args, **opts)
+                    try:
+                        while True:
+                            t = time.perf_counter()
+                            try:
+                                value = next(iterator)
+                            except StopIteration as e:
+                                return e.value
+                            finally:
+                                elapsed += time.perf_counter() - t
+                            yield value
+                    finally:
+                        iterator.close()
+                        self.record(label, elapsed)
+
+            else:
+
+                @wraps(function)
+                def wrapper(*args, **opts):
+                    t = time.perf_counter()
+                    try:
+                        return function(*args, **opts)
+                    finally:
+                        self.record(label, time.perf_counter() - t)
+
+            return wrapper
+
+        return decorator
+
+    def clear(self):
+        with self.lock:
+            self.timings.clear()
+
+    def stats(self):
+        """ Return one record per name, with count, total, mean, min, max and percentiles in seconds, largest total first. """
+        with self.lock:
+            return tuple(sorted(
+                (timings.info() for timings in self.timings.values()),
+                key = lambda info: info.total,
+                reverse = True))
+
+    def to_json(self, **opts):
+        import json
+        return json.dumps(self.stats(), **opts)
+
+    def report(self):
+        """ Return the stats as a text table, durations in milliseconds. """
+        lines = ['%-48s %8s %10s %9s %9s %9s %9s %9s' % (
+            'name', 'count', 'total', 'mean', 'min', 'p50', 'p99', 'max')]
+        for info in self.stats():
+            lines.append('%-48s %8i %10.3f %9.3f %9.3f %9.3f %9.3f %9.3f' % (
+                info.name, info.count, info.total * 1000, info.mean * 1000, info.min * 1000,
+                info.p50 * 1000, info.p99 * 1000, info.max * 1000))
+        return '\n'.join(lines)
+
+    def dump(self, target=None):
+        """ Write the stats to `target`: a path ending in .json, :code:`json` for JSON on stderr, anything else for a table on stderr. """
+        if not self.timings:
+            return
+        if target and target.endswith('.json'):
+            with open(target, 'w') as stream:
+                stream.write(self.to_json(indent=2))
+        elif target == 'json':
+            print(self.to_json(), file=sys.stderr)
+        else:
+            print(self.report(), file=sys.stderr)
+
+    def dump_at_exit(self, target=None):
+        import atexit
+        atexit.register(self.dump, target)
+
+
+#RPY_TIMINGS enables the default registry, its value is passed to TimingRegistry.dump at exit
+registry = TimingRegistry(enabled=bool(os.environ.get('RPY_TIMINGS')))
+
+if registry.enabled:
+    registry.dump_at_exit(os.environ['RPY_TIMINGS'])
+
+timer = registry.timer
+instrument = registry.instrument
@@ -2,6 +2,12 @@
 
 from __future__ import absolute_import, print_function, unicode_literals
 
+import sys
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
 from rpy.functions.datastructures import data
 from rpy.functions.functional import composition
 
@@ -15,3 +21,182 @@ def decorate(*func):
 to_tuple = decorate(tuple)
 to_dict = decorate(dict)
 to_data = decorate(data)
+
+
+def freeze(obj):
+    """ Return a hashable version of `obj`, converting dicts, lists and sets recursively, so that it can be used as a cache key.
+
+    Dicts, including :class:`~rpy.functions.datastructures.data`, are keyed independently of insertion order. """
+    if isinstance(obj, dict):
+        return dict, frozenset((k, freeze(v)) for k, v in obj.items())
+    if isinstance(obj, (list, tuple)):
+        return obj.__class__, tuple(map(freeze, obj))
+    if isinstance(obj, (set, frozenset)):
+        return frozenset, frozenset(map(freeze, obj))
+    return obj
+
+
+def make_key(args, opts):
+    if opts:
+        return freeze(args), freeze(opts)
+    return freeze(args)
+
+
+_missing = object()
+
+
+class MemoryCache(object):
+    """ A thread safe LRU cache, with optional limits on entries, on total size, and on the age of entries.
+
+    The size of each entry is computed by `sizeof`, by default :func:`sys.getsizeof` which does not include referenced objects. """
+
+    def __init__(self, maxsize=128, maxbytes=None, ttl=None, sizeof=sys.getsizeof):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.ttl = ttl
+        self.sizeof = sizeof
+        self.lock = threading.RLock()
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        with self.lock:
+            try:
+                value, expires, size = self.entries[key]
+            except KeyError:
+                self.misses += 1
+                return default
+
+            if expires is not None and expires < time.monotonic():
+                self.discard(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        size = self.maxbytes is not None and self.sizeof(value) or 0
+        if self.maxbytes is not None and size > self.maxbytes:
+            return value
+
+        with self.lock:
+            self.discard(key)
+            self.entries[key] = (
+                value,
+                self.ttl is not None and time.monotonic() + self.ttl or None,
+                size
+            )
+            self.bytes += size
+
+            while self.maxsize is not None and len(self.entries) > self.maxsize or \
+                    self.maxbytes is not None and self.bytes > self.maxbytes:
+                self.discard(next(iter(self.entries)))
+                self.evictions += 1
+
+        return value
+
+    def discard(self, key):
+        with self.lock:
+            try:
+                value, expires, size = self.entries.pop(key)
+            except KeyError:
+                return
+            self.bytes -= size
+
+    def clear(self):
+        """ Remove all entries and reset the counters, like :func:`functools.lru_cache` does. """
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.expirations = 0
+
+    def info(self):
+        with self.lock:
+            return data(
+                hits = self.hits,
+                misses = self.misses,
+                evictions = self.evictions,
+                expirations = self.expirations,
+                size = len(self.entries),
+                bytes = self.bytes,
+                maxsize = self.maxsize,
+                maxbytes = self.maxbytes,
+                ttl = self.ttl,
+            )
+
+
+def memoize(function=None, maxsize=128, maxbytes=None, ttl=None, key=make_key, sizeof=sys.getsizeof):
+    """ Cache the results of a function by its arguments. Can be used as :code:`@memoize` or with options :code:`@memoize(maxsize=1000, ttl=60)`.
+
+    Arguments go through `key`, which by default accepts dicts, lists and sets as well as hashable objects.
+    Least recently used entries are evicted once there are more than `maxsize` entries or more than `maxbytes` in total, and entries older than `ttl` seconds are ignored.
+
+    When decorating a coroutine function the awaited result is cached, and concurrent calls with the same arguments await the same call.
+    The decorated function exposes :code:`cache_info()` and :code:`cache_clear()`.
+    """
+
+    def decorator(function):
+
+        import inspect
+
+        cache = MemoryCache(maxsize=maxsize, maxbytes=maxbytes, ttl=ttl, sizeof=sizeof)
+
+        if inspect.iscoroutinefunction(function):
+
+            in_flight = {}
+
+            def retrieve(task):
+                #marks the exception as retrieved, avoiding warnings when every caller was cancelled
+                if not task.cancelled():
+                    task.exception()
+
+            async def call(k, args, opts):
+                try:
+                    return cache.set(k, await function(*args, **opts))
+                finally:
+                    del in_flight[k]
+
+            @wraps(function)
+            async def wrapper(*args, **opts):
+                k = key(args, opts)
+                value = cache.get(k, _missing)
+                if value is not _missing:
+                    return value
+
+                import asyncio
+
+                #the call runs in its own task, cancelling a caller does not cancel it for the others
+                task = in_flight.get(k, None)
+                if task is None:
+                    task = in_flight[k] = asyncio.get_running_loop().create_task(call(k, args, opts))
+                    task.add_done_callback(retrieve)
+                return await asyncio.shield(task)
+
+        else:
+
+            @wraps(function)
+            def wrapper(*args, **opts):
+                k = key(args, opts)
+                value = cache.get(k, _missing)
+                if value is _missing:
+                    value = cache.set(k, function(*args, **opts))
+                return value
+
+        wrapper.cache = cache
+        wrapper.cache_info = cache.info
+        wrapper.cache_clear = cache.clear
+        return wrapper
+
+    if function is not None:
+        return decorator(function)
+    return decorator
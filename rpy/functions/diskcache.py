@@ -0,0 +1,378 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import hashlib
+import inspect
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from functools import partial, wraps
+
+from rpy.functions import six
+from rpy.functions.datastructures import data
+from rpy.functions.decorators import MemoryCache
+from rpy.functions.encoding import force_bytes
+from rpy.functions.process import user_cache_path
+
+
+def _update_stable(h, obj):
+    #pickle output for sets and dicts depends on hash randomization, containers are serialized recursively in a stable order
+    if isinstance(obj, dict):
+        h.update(b'd')
+        for item in sorted(_stable_bytes(k) + _stable_bytes(v) for k, v in obj.items()):
+            h.update(item)
+    elif isinstance(obj, (set, frozenset)):
+        h.update(b's')
+        for item in sorted(map(_stable_bytes, obj)):
+            h.update(item)
+    elif isinstance(obj, (list, tuple)):
+        h.update(obj.__class__.__name__.encode('ascii'))
+        for item in obj:
+            _update_stable(h, item)
+    else:
+        h.update(pickle.dumps(obj, protocol=4))
+    h.update(b'.')
+
+
+def _stable_bytes(obj):
+    h = hashlib.blake2b(digest_size=16)
+    _update_stable(h, obj)
+    return h.digest()
+
+
+_plain_types = frozenset(six.protected_types + (bytes, float, complex))
+
+
+def _is_plain(obj):
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        cls = obj.__class__
+        if cls is tuple or cls is list:
+            stack.extend(obj)
+        elif not cls in _plain_types:
+            return False
+    return True
+
+
+def _is_constant(obj):
+    #like _is_plain, but lists are mutable and their content can change after a function is hashed
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        cls = obj.__class__
+        if cls is tuple:
+            stack.extend(obj)
+        elif not cls in _plain_types:
+            return False
+    return True
+
+
+def stable_hash(obj):
+    """ Return a hash of `obj` which is the same across processes. 
+
+    Lists and tuples of strings, numbers, dates and :data:`None` are hashed from their pickle, which is deterministic for them,
+    other objects are serialized recursively, sorting dicts and sets. """
+    if _is_plain(obj):
+        return hashlib.blake2b(b'p' + pickle.dumps(obj, protocol=4), digest_size=20).hexdigest()
+    return hashlib.blake2b(b's' + _stable_bytes(obj), digest_size=20).hexdigest()
+
+
+def code_hash(function):
+    """ Return a hash of the bytecode of `function`, of its default arguments and of the values in its closure,
+    which does not depend on its position in the source file.
+
+    Functions found in defaults and closures are hashed the same way, other values are hashed when they are
+    strings, numbers, dates or tuples of them. Any other object only contributes its class,
+    so that a closure over a mutable cache or counter does not change the hash every time it is used.
+
+    Besides functions, `function` can be a method, a :func:`functools.partial`, whose arguments are hashed like defaults,
+    an instance of a class defining :code:`__call__`, or a builtin, which is hashed by name. """
+    h = hashlib.blake2b(digest_size=16)
+    seen = set()
+
+    def update(code):
+        h.update(code.co_code)
+        h.update(force_bytes(repr(code.co_names)))
+        for const in code.co_consts:
+            if inspect.iscode(const):
+                update(const)
+            else:
+                _update_stable(h, const)
+
+    def update_value(obj):
+        if inspect.isfunction(obj):
+            update_function(inspect.unwrap(obj))
+        elif _is_constant(obj):
+            _update_stable(h, obj)
+        else:
+            h.update(force_bytes('<%s.%s>' % (obj.__class__.__module__, obj.__class__.__qualname__)))
+
+    def update_function(function):
+        #recursive functions reference themselves through their closure
+        if id(function) in seen:
+            h.update(b'r')
+            return
+        seen.add(id(function))
+
+        update(function.__code__)
+        for value in function.__defaults__ or ():
+            update_value(value)
+        for name, value in sorted((function.__kwdefaults__ or {}).items()):
+            h.update(force_bytes(name))
+            update_value(value)
+        for cell in function.__closure__ or ():
+            try:
+                update_value(cell.cell_contents)
+            except ValueError:
+                #the cell of a variable that is not assigned yet
+                h.update(b'e')
+
+    def update_callable(obj):
+        obj = inspect.unwrap(obj)
+        if inspect.isfunction(obj):
+            update_function(obj)
+        elif inspect.ismethod(obj):
+            update_callable(obj.__func__)
+            update_value(obj.__self__)
+        elif isinstance(obj, partial):
+            update_callable(obj.func)
+            for value in obj.args:
+                update_value(value)
+            for name, value in sorted(obj.keywords.items()):
+                h.update(force_bytes(name))
+                update_value(value)
+        elif inspect.isbuiltin(obj):
+            h.update(force_bytes('<%s>' % _callable_name(obj)))
+        elif inspect.isfunction(getattr(obj.__class__, '__call__', None)):
+            h.update(force_bytes('<%s.%s>' % (obj.__class__.__module__, obj.__class__.__qualname__)))
+            update_function(obj.__class__.__call__)
+        else:
+            raise TypeError(
+                'Cannot hash %r, expected a function, a method, a functools.partial, a builtin or an instance of a class defining __call__' % (obj, ))
+
+    update_callable(function)
+    return h.hexdigest()
+
+def _callable_name(function):
+    if isinstance(function, partial):
+        return _callable_name(function.func)
+    try:
+        return '%s.%s' % (function.__module__, function.__qualname__)
+    except AttributeError:
+        return '%s.%s' % (function.__class__.__module__, function.__class__.__qualname__)
+
+
+class DiskCache(object):
+    """ A size capped LRU cache stored in a sqlite database, shared by processes using the same `path`.
+
+    Values are unpickled, so the database must only be writable by trusted users. A new database is created readable only by the user,
+    the default one is inside the user cache folder, whose permissions are restricted to the user on every connection,
+    since other tools may have created it with the default mode.
+
+    Writes are done in transactions, so that concurrent processes always read complete entries.
+    Once the values stored exceed `maxbytes`, least recently used entries are removed. The total size is maintained by triggers,
+    so that writes do not scan the table. The access time of an entry is only updated by reads when it's older than `touch_interval` seconds,
+    most reads do not write.
+    """
+
+    def __init__(self, path=None, maxbytes=256 * 1024 * 1024, timeout=30, touch_interval=10):
+        self.private = path is None
+        self.path = path or user_cache_path('diskcache.sqlite')
+        self.maxbytes = maxbytes
+        self.timeout = timeout
+        self.touch_interval = touch_interval
+        self.lock = threading.RLock()
+        self.pid = None
+        self.connection = None
+
+    def connect(self):
+        #sqlite connections cannot be shared with forked processes
+        if self.connection is None or not self.pid == os.getpid():
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, mode=0o700, exist_ok=True)
+            if self.private and folder:
+                os.chmod(folder, 0o700)
+            #the file is created before sqlite opens it, sqlite would use the default mode
+            os.close(os.open(self.path, os.O_CREAT | os.O_RDWR, 0o600))
+            if self.private:
+                os.chmod(self.path, 0o600)
+            self.connection = sqlite3.connect(
+                self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('PRAGMA synchronous=NORMAL')
+            #rows replaced by INSERT OR REPLACE only fire the delete trigger with recursive triggers
+            self.connection.execute('PRAGMA recursive_triggers=ON')
+            self.connection.execute('BEGIN IMMEDIATE')
+            try:
+                self.create_schema(self.connection)
+            except BaseException:
+                self.connection.execute('ROLLBACK')
+                raise
+            else:
+                self.connection.execute('COMMIT')
+            self.pid = os.getpid()
+        return self.connection
+
+    def create_schema(self, connection):
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS entries ('
+            'key TEXT PRIMARY KEY, namespace TEXT, value BLOB, size INTEGER, accessed REAL)')
+        connection.execute(
+            'CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)')
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS totals (id INTEGER PRIMARY KEY CHECK (id = 0), size INTEGER)')
+        #databases created before the totals table are counted once
+        connection.execute(
+            'INSERT OR IGNORE INTO totals SELECT 0, COALESCE(SUM(size), 0) FROM entries')
+        connection.execute(
+            'CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN '
+            'UPDATE totals SET size = size + new.size WHERE id = 0; END')
+        connection.execute(
+            'CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries BEGIN '
+            'UPDATE totals SET size = size - old.size WHERE id = 0; END')
+        connection.execute(
+            'CREATE TRIGGER IF NOT EXISTS entries_update AFTER UPDATE OF size ON entries BEGIN '
+            'UPDATE totals SET size = size - old.size + new.size WHERE id = 0; END')
+
+    def get(self, key, default=None):
+        with self.lock:
+            connection = self.connect()
+            row = connection.execute(
+                'SELECT value, accessed FROM entries WHERE key = ?', (key, )).fetchone()
+            if row is None:
+                return default
+            now = time.time()
+            if now - row[1] > self.touch_interval:
+                connection.execute(
+                    'UPDATE entries SET accessed = ? WHERE key = ?', (now, key))
+        return pickle.loads(row[0])
+
+    def set(self, key, value, namespace=None):
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            connection = self.connect()
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                connection.execute(
+                    'INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)',
+                    (key, namespace, payload, len(payload), time.time()))
+                if self.maxbytes is not None:
+                    self.evict(connection)
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+            else:
+                connection.execute('COMMIT')
+        return value
+
+    def total(self, connection):
+        return connection.execute('SELECT size FROM totals WHERE id = 0').fetchone()[0]
+
+    def evict(self, connection, batch=64):
+        total = self.total(connection)
+        evicted = 0
+        while total > self.maxbytes:
+            rows = connection.execute(
+                'SELECT key, size FROM entries ORDER BY accessed LIMIT ?', (batch, )).fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                if total <= self.maxbytes:
+                    break
+                connection.execute('DELETE FROM entries WHERE key = ?', (key, ))
+                total -= size
+                evicted += 1
+        return evicted
+
+    def clear(self, namespace=None):
+        with self.lock:
+            if namespace is None:
+                self.connect().execute('DELETE FROM entries')
+            else:
+                self.connect().execute('DELETE FROM entries WHERE namespace = ?', (namespace, ))
+
+    def info(self, namespace=None):
+        with self.lock:
+            if namespace is None:
+                connection = self.connect()
+                size, = connection.execute('SELECT COUNT(*) FROM entries').fetchone()
+                total = self.total(connection)
+            else:
+                size, total = self.connect().execute(
+                    'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries WHERE namespace = ?', (namespace, )).fetchone()
+        return data(size = size, bytes = total, maxbytes = self.maxbytes, path = self.path)
+
+    def close(self):
+        with self.lock:
+            if self.connection is not None and self.pid == os.getpid():
+                self.connection.close()
+            self.connection = None
+
+
+_missing = object()
+
+
+def disk_memoize(function=None, path=None, maxbytes=256 * 1024 * 1024, memory=None, cache=None):
+    """ Cache the results of a pure function on disk, so that they survive restarts.
+    Can be used as :code:`@disk_memoize` or with options :code:`@disk_memoize(path='cache.sqlite', memory=128)`.
+
+    Results are keyed on the qualified name of the function, on a hash of its bytecode, defaults and closure (see :func:`code_hash`),
+    so that changing the function invalidates its results,
+    and on its arguments. Dicts, lists and sets are accepted as arguments, results must be picklable.
+
+    `memory` adds an in memory LRU tier in front of the disk, with at most `memory` entries.
+    A :class:`DiskCache` can be shared between functions using `cache`.
+    The decorated function exposes :code:`cache_info()` and :code:`cache_clear()`.
+    """
+
+    def decorator(function):
+
+        disk = cache or DiskCache(path=path, maxbytes=maxbytes)
+        front = memory and MemoryCache(maxsize=memory) or None
+        namespace = '%s:%s' % (_callable_name(function), code_hash(function))
+        stats = data(hits = 0, memory_hits = 0, misses = 0)
+
+        @wraps(function)
+        def wrapper(*args, **opts):
+            #always a pair, so that positional arguments never hash like arguments and options
+            key = '%s:%s' % (namespace, stable_hash((args, opts)))
+
+            if front is not None:
+                value = front.get(key, _missing)
+                if value is not _missing:
+                    stats.memory_hits += 1
+                    return value
+
+            value = disk.get(key, _missing)
+            if value is _missing:
+                stats.misses += 1
+                value = disk.set(key, function(*args, **opts), namespace=namespace)
+            else:
+                stats.hits += 1
+
+            if front is not None:
+                front.set(key, value)
+            return value
+
+        def cache_info():
+            return data(stats, **disk.info(namespace))
+
+        def cache_clear():
+            if front is not None:
+                front.clear()
+            disk.clear(namespace)
+            stats.update(hits = 0, memory_hits = 0, misses = 0)
+
+        wrapper.cache = disk
+        wrapper.cache_info = cache_info
+        wrapper.cache_clear = cache_clear
+        return wrapper
+
+    if function is not None:
+        return decorator(function)
+    return decorator
@@ -3,12 +3,175 @@
 from __future__ import absolute_import, print_function, unicode_literals
 
 import inspect
+import time
+import weakref
+from itertools import product
 
+from rpy.functions.datastructures import data
 from rpy.functions.functional import flatten
 
 #original idea by Guido in person.
 #https://www.artima.com/weblogs/viewpost.jsp?thread=101605
 
+class DispatchCache(object):
+    """ A resolution cache that does not keep classes alive.
+
+    Entries of :attr:`table` are keyed on the :func:`id` of a class, or on a tuple of ids, so that a hit is a plain dictionary lookup. 
+    Each class is tracked with a weak reference, and its entries are dropped as soon as the class is garbage collected.
+
+    When `maxsize` is set, the oldest entries are evicted first once the cache is full. 
+    Entries stored with `pinned` set are never evicted and do not count towards `maxsize`.
+
+    :attr:`stats` holds the records of :meth:`Dispatch.enable_stats` under the same keys, they are not evicted
+    but they are dropped with the entries of a class that is garbage collected.
+    """
+
+    def __init__(self, maxsize=None):
+        self.maxsize = maxsize
+        self.evictions = 0
+        self.collections = 0
+        self.table = {}
+        self.refs = {}
+        self.stats = {}
+        #evictable keys, oldest first
+        self.order = {}
+
+    @staticmethod
+    def key(types):
+        if isinstance(types, tuple):
+            return tuple(map(id, types))
+        return id(types)
+
+    def lookup(self, types, default=None):
+        """ Return the value cached for a class or a tuple of classes. """
+        return self.table.get(self.key(types), default)
+
+    def store(self, types, value, pinned=False):
+        """ Cache `value` for a class or a tuple of classes and return it. """
+        key = self.key(types)
+
+        if not key in self.table:
+            if self.maxsize is not None and not pinned:
+                while self.order and len(self.order) >= self.maxsize:
+                    self.discard(next(iter(self.order)))
+                    self.evictions += 1
+                self.order[key] = None
+
+            self._track(types, key)
+
+        elif pinned:
+            self.order.pop(key, None)
+
+        self.table[key] = value
+        return value
+
+    def _track(self, types, key):
+        for cls in _iter_types(types):
+            try:
+                self.refs[id(cls)][1].add(key)
+            except KeyError:
+                self.refs[id(cls)] = (
+                    weakref.ref(cls, lambda ref, cls_id=id(cls): self._collected(cls_id, ref)),
+                    {key}
+                )
+
+    def _untrack(self, key):
+        for cls_id in _iter_types(key):
+            try:
+                keys = self.refs[cls_id][1]
+            except KeyError:
+                continue
+            keys.discard(key)
+            if not keys:
+                del self.refs[cls_id]
+
+    def record(self, types, factory):
+        """ Return the stats record of a class or a tuple of classes, creating it with `factory`. """
+        key = self.key(types)
+        try:
+            return self.stats[key]
+        except KeyError:
+            if not key in self.table:
+                self._track(types, key)
+            record = self.stats[key] = factory()
+            return record
+
+    def discard(self, key):
+        """ Remove an entry, by key, if present. """
+        try:
+            del self.table[key]
+        except KeyError:
+            return
+        self.order.pop(key, None)
+
+        #classes with stats stay tracked, so that their records are dropped when they are collected
+        if not key in self.stats:
+            self._untrack(key)
+
+    def _collected(self, cls_id, ref):
+        try:
+            other, keys = self.refs[cls_id]
+        except KeyError:
+            return
+        if other is ref:
+            del self.refs[cls_id]
+            for key in keys:
+                self.stats.pop(key, None)
+                if key in self.table:
+                    self.discard(key)
+                    self.collections += 1
+
+    def types(self, key):
+        """ Return the classes, or tuple of classes, of a key, or :data:`None` when they are not tracked or were collected. """
+        try:
+            types = tuple(self.refs[cls_id][0]() for cls_id in _iter_types(key))
+        except KeyError:
+            return None
+        if None in types:
+            return None
+        return isinstance(key, tuple) and types or types[0]
+
+    def iter_types(self):
+        """ Yield the classes, or tuples of classes, currently cached. """
+        for key in tuple(self.table):
+            types = self.types(key)
+            if types is not None:
+                yield types
+
+    def clear(self):
+        """ Remove all entries, stats are kept. The :attr:`table` is emptied in place. """
+        if not self.stats:
+            self.table.clear()
+            self.refs.clear()
+            self.order.clear()
+            return
+        for key in tuple(self.table):
+            self.discard(key)
+
+    def clear_stats(self):
+        for key in tuple(self.stats):
+            del self.stats[key]
+            if not key in self.table:
+                self._untrack(key)
+
+    def info(self):
+        return data(
+            size = len(self.table),
+            maxsize = self.maxsize,
+            evictions = self.evictions,
+            collections = self.collections,
+        )
+
+    def __len__(self):
+        return len(self.table)
+
+
+def _iter_types(types):
+    if isinstance(types, tuple):
+        return types
+    return (types, )
+
+
 class Dispatch(object):
     """ A method dispatcher class allowing for multiple implementations of a function. Each implementation is associated to a specific input type.
     
@@ -22,11 +185,47 @@ class Dispatch(object):
     check for the first implementation to match with :class:`collections.OrderedDict`, then with :class:`dict`, and ultimately to :data:`object`.
 
     Once the mapping is determined, it is cached for later use.
+
+    When `nargs` is greater than one the dispatcher looks at the types of the first `nargs` positional arguments.
+    Implementations are registered on a tuple of types, one for each dispatched position::
+
+        dispatcher = Dispatch(nargs = 2)
+
+        @dispatcher.dispatch(int, (str, bytes))
+        def my_func(...)
+
+    The implementation whose types are the most specific in every position wins. Two signatures that can both match
+    the same arguments without one being more specific than the other are ambiguous, and registering them raises
+    an error unless the signature resolving the tie is already registered.
+    The winning implementation is cached on the tuple of concrete argument classes.
+
+    The cache does not keep classes alive, entries are dropped when a class is garbage collected. 
+    `maxsize` limits the number of cached resolutions, see :class:`DispatchCache`.
     """
 
-    def __init__(self):
+    def __init__(self, nargs=1, maxsize=None):
+        if nargs < 1:
+            raise ValueError('nargs must be a positive integer, got %s' % nargs)
+        self.nargs = nargs
+        self.maxsize = maxsize
         self.clear()
 
+    def _bind_resolve(self):
+        self._lookup = self.dispatch_dict_cache.table.get
+        cls = isinstance(self, _StatsMixin) and self.__class__.__bases__[1] or self.__class__
+        self._resolve_overridden = not cls.resolve is Dispatch.resolve
+        if not self._resolve_overridden:
+            #resolve is specialised on nargs once, instead of checking it on every call
+            self._fast_resolve = self.nargs == 1 and self._resolve_one or self._resolve_many
+            self._call_lookup = self._lookup
+        else:
+            #an overridden resolve is used on every call, cache hits included
+            self._fast_resolve = self._call_resolve
+            self._call_lookup = _no_lookup
+
+    def _call_resolve(self, *args):
+        return self.resolve(*args[:self.nargs])
+
     def dispatch(self, *args, **opts):
         """ Annotate a function and map it to a given set of type(s).
         
@@ -48,9 +247,17 @@ class Dispatch(object):
 
         Implementation must be unique. Registering the same combination of types will raise an error, 
         except if `force` is set to :data:`True`, in which case the mapping is updated.
+
+        When dispatching on more than one argument, every positional argument is the type(s) of the corresponding
+        position. Missing positions default to :data:`object`::
+
+            @dispatcher.dispatch(int, (float, int))
+            def my_func(...)
         """
 
         def register(func):
+            if self.nargs > 1:
+                return self.register(func, args, **opts)
             return self.register(func, *args, **opts)
 
         return register
@@ -74,6 +281,52 @@ class Dispatch(object):
                 raise ValueError('%s is not a class' % t)
             yield t
 
+    def validate_signatures(self, types):
+        """ Yield the keys of :attr:`dispatch_dict` described by `types`.
+
+        With a single dispatched argument keys are classes, otherwise they are tuples of classes with one entry per position. """
+        if self.nargs == 1:
+            yield from self.validate_types(types)
+            return
+
+        if types is object:
+            types = ()
+        elif not isinstance(types, (tuple, list)):
+            types = (types, )
+
+        if len(types) > self.nargs:
+            raise ValueError('Expected at most %s types, got %s' % (self.nargs, len(types)))
+
+        yield from product(*(
+            tuple(self.validate_types(t))
+            for t in tuple(types) + (object, ) * (self.nargs - len(types))
+        ))
+
+    def _is_more_specific(self, signature, other):
+        return all(map(issubclass, signature, other))
+
+    def _check_ambiguities(self, signatures):
+        """ Raise an error if a newly registered signature is ambiguous with a registered one. 
+
+        Two signatures are ambiguous when, position by position, their types are related but neither signature is more specific than the other,
+        i.e. :code:`(int, object)` and :code:`(object, int)` both match :code:`(1, 1)`. The tie is resolved by registering the more specific signature :code:`(int, int)`. 
+        """
+        for signature in signatures:
+            for other in self.dispatch_dict:
+                if other == signature:
+                    continue
+                if self._is_more_specific(signature, other) or self._is_more_specific(other, signature):
+                    continue
+                if not all(issubclass(a, b) or issubclass(b, a) for a, b in zip(signature, other)):
+                    continue
+                resolution = tuple(
+                    issubclass(a, b) and a or b
+                    for a, b in zip(signature, other)
+                )
+                if not resolution in self.dispatch_dict:
+                    raise TypeError(
+                        "Ambiguous registration for input types: %s and %s, register %s first" % (signature, other, resolution))
+
     def register(self, function, types=object, force=False):
         """ Equivalent to annotation :meth:`~wolframclient.utils.dispatch.Dispatch.dispatch` but as 
         a function.
@@ -81,56 +334,310 @@ class Dispatch(object):
         if not callable(function):
             raise ValueError('Function %s is not callable' % function)
 
-        self.clear_cache()
+        signatures = tuple(self.validate_signatures(types))
 
-        for t in self.validate_types(types):
+        for t in signatures:
             if not force and t in self.dispatch_dict:
                 raise TypeError(
                     "Duplicated registration for input type(s): %s" % (t, ))
-            else:
-                self.dispatch_dict[t] = function
+
+        previous = dict(self.dispatch_dict)
+
+        for t in signatures:
+            self.dispatch_dict[t] = function
+
+        if self.nargs > 1:
+            try:
+                self._check_ambiguities(signatures)
+            except TypeError:
+                self.dispatch_dict = previous
+                raise
+
+        self.clear_cache()
 
         return function
 
     def unregister(self, types=object):
         """ Remove implementations associated with types. """
 
-        self.clear_cache()
-
-        for t in self.validate_types(types):
+        for t in tuple(self.validate_signatures(types)):
             try:
                 del self.dispatch_dict[t]
             except KeyError:
                 pass
 
+        self.clear_cache()
+
     def clear(self):
         """ Reset the dispatcher to its initial state. """
         self.dispatch_dict = dict()
-        self.dispatch_dict_cache = dict()
+        self.dispatch_dict_cache = DispatchCache(self.maxsize)
+        self.batch_dict = dict()
+        self.batch_dict_cache = DispatchCache(self.maxsize)
+        self.frozen = False
+        self._bind_resolve()
 
     def clear_cache(self):
-        if self.dispatch_dict_cache:
-            self.dispatch_dict_cache = dict()
+        """ Drop cached resolutions. A frozen dispatcher rebuilds its table instead. """
+        self.batch_dict_cache.clear()
+        if self.frozen:
+            self.freeze()
+        else:
+            self.dispatch_dict_cache.clear()
+
+    def freeze(self, *types):
+        """ Precompute the resolution table and keep it up to date.
+
+        The table contains every registered type, every type already seen by :meth:`resolve` (i.e. during a warm-up run) 
+        and the additional `types`, each one accepted in the same format used by :meth:`register`::
+
+            dispatcher.freeze(int, float, datetime.date)
+
+        Known types are then resolved with a single dictionary lookup. Types that are not in the table are still resolved, and added to it.
+        The precomputed entries are never evicted by `maxsize`, which only applies to the types added later.
+        Registering or unregistering implementations on a frozen dispatcher transparently rebuilds the table.
+        """
+        keys = set(self.dispatch_dict_cache.iter_types())
+        keys.update(self.dispatch_dict)
+        for t in types:
+            keys.update(self.validate_signatures(t))
+
+        self.dispatch_dict_cache.clear()
+        for key in keys:
+            self.dispatch_dict_cache.store(key, self.resolve_key(key), pinned=True)
+        self.frozen = True
+
+    def unfreeze(self):
+        """ Stop rebuilding the resolution table on registration, resolutions are cached lazily again. """
+        self.frozen = False
+        self.clear_cache()
+
+    def resolve(self, *args):
+        """ Return the implementation better matching the type the argument type. 
+
+        The dispatcher only passes the first `nargs` arguments, so that subclasses can override :code:`resolve(self, arg)`. """
+        if self.nargs == 1:
+            return self._resolve_one(*args)
+        return self._resolve_many(*args)
+
+    def _resolve_one(self, arg, *args):
+        key = arg.__class__
+        impl = self._lookup(id(key))
+        if impl is None:
+            impl = self.dispatch_dict_cache.store(key, self.resolve_key(key))
+        return impl
+
+    def _resolve_many(self, *args):
+        #the tuple of classes is only built on misses
+        impl = self._lookup(tuple([id(arg.__class__) for arg in args[:self.nargs]]))
+        if impl is None:
+            key = tuple(arg.__class__ for arg in args[:self.nargs])
+            impl = self.dispatch_dict_cache.store(key, self.resolve_key(key))
+        return impl
+
+    def cache_info(self):
+        """ Return size, maxsize, evictions and garbage collected entries of the resolution cache. """
+        return self.dispatch_dict_cache.info()
+
+    def resolve_key(self, key):
+        """ Walk the :data:`__mro__` of the class(es) in `key` and return the implementation to use, bypassing the cache. 
+
+        With multiple arguments the candidate more specific than all the others in every position wins.
+        If no such candidate exists, which can only happen with multiple inheritance, positions are compared left to right. """
+        signature = self._resolve_signature(key, self.dispatch_dict)
+        if signature is None:
+            return self.default_function
+        return self.dispatch_dict[signature]
+
+    def _resolve_signature(self, key, dispatch_dict):
+        if self.nargs == 1:
+            for t in key.__mro__:
+                if t in dispatch_dict:
+                    return t
+            return None
+
+        mros = tuple(cls.__mro__ for cls in key)
+        candidates = []
+        for signature in dispatch_dict:
+            if len(signature) == len(mros) and all(map(tuple.__contains__, mros, signature)):
+                candidates.append((tuple(map(tuple.index, mros, signature)), signature))
+
+        if not candidates:
+            return None
+
+        for rank, signature in candidates:
+            if all(all(map(int.__le__, rank, other)) for other, _ in candidates):
+                return signature
+
+        return min(candidates)[1]
+
+    def dispatch_batch(self, *args, **opts):
+        """ Annotate a function and map it to a given set of type(s) when used with :meth:`map`.
+
+        The function receives a list of items of the same concrete type, followed by the extra arguments given to :meth:`map`, 
+        and must return one result per item, in the same order::
+
+            @dispatcher.dispatch_batch(int)
+            def my_func(values, *args)
+        """
+
+        def register(func):
+            if self.nargs > 1:
+                return self.register_batch(func, args, **opts)
+            return self.register_batch(func, *args, **opts)
+
+        return register
+
+    def register_batch(self, function, types=object, force=False):
+        """ Equivalent to annotation :meth:`dispatch_batch` but as a function. """
+        if not callable(function):
+            raise ValueError('Function %s is not callable' % function)
+
+        signatures = tuple(self.validate_signatures(types))
+
+        for t in signatures:
+            if not force and t in self.batch_dict:
+                raise TypeError(
+                    "Duplicated batch registration for input type(s): %s" % (t, ))
+
+        for t in signatures:
+            self.batch_dict[t] = function
+
+        self.batch_dict_cache.clear()
+
+        return function
+
+    def resolve_batch(self, key):
+        """ Return the batch implementation for `key`, or :data:`None` when items should be handled one by one.
 
-    def resolve(self, arg):
-        """ Return the implementation better matching the type the argument type. """
-        for t in arg.__class__.__mro__:
+        A batch implementation is used unless a per item implementation is registered for a more specific type. """
+        impl = self.batch_dict_cache.lookup(key, self.batch_dict_cache)
+        if impl is not self.batch_dict_cache:
+            return impl
+
+        impl = None
+        batch_signature = self._resolve_signature(key, self.batch_dict)
+        if batch_signature is not None:
+            signature = self._resolve_signature(key, self.dispatch_dict)
+            if signature is None or signature == batch_signature or not self._is_more_specific(
+                    self.nargs == 1 and (signature, ) or signature,
+                    self.nargs == 1 and (batch_signature, ) or batch_signature):
+                impl = self.batch_dict[batch_signature]
+
+        return self.batch_dict_cache.store(key, impl)
+
+    def map(self, iterable, *args, **opts):
+        """ Apply the dispatcher to every item of `iterable`, passing `args` and `opts` after each item, and return a :class:`tuple` of results.
+
+        Items are grouped by concrete type. Each group is resolved once and sent as a whole list to the batch implementation, 
+        if one is registered with :meth:`dispatch_batch`, otherwise the implementation is called for each item. 
+        Results are returned in the original order.
+        """
+        items = tuple(iterable)
+
+        groups = {}
+        for i, item in enumerate(items):
             try:
-                return self.dispatch_dict_cache[t]
+                groups[item.__class__].append(i)
             except KeyError:
-                impl = self.dispatch_dict.get(t, None)
-                if impl:
-                    self.dispatch_dict_cache[t] = impl
-                    return impl
+                groups[item.__class__] = [i]
+
+        results = [None] * len(items)
 
-        return self.default_function
+        for cls, indexes in groups.items():
+            for i, value in zip(indexes, self._map_group(cls, [items[i] for i in indexes], args, opts)):
+                results[i] = value
+
+        return tuple(results)
+
+    def _resolve_group_batch(self, cls, args):
+        if self.nargs == 1:
+            return self.resolve_batch(cls)
+        return self.resolve_batch(
+            (cls, ) + tuple(arg.__class__ for arg in args[:self.nargs - 1]))
+
+    def _call_batch(self, batch, cls, group, args, opts):
+        values = tuple(batch(group, *args, **opts))
+        if not len(values) == len(group):
+            raise ValueError(
+                'Batch implementation for %s returned %s results for %s items' % (cls.__name__, len(values), len(group)))
+        return values
+
+    def _map_group(self, cls, group, args, opts):
+        batch = self._resolve_group_batch(cls, args)
+        if batch is None:
+            impl = self.resolve(group[0], *args[:self.nargs - 1])
+            return [impl(item, *args, **opts) for item in group]
+        return self._call_batch(batch, cls, group, args, opts)
 
     def default_function(self, *args, **opts):
         """ Ultimately called when no type was found. """
         raise ValueError('Unable to handle args')
 
-    def __call__(self, arg, *args, **opts):
-        return self.resolve(arg)(arg, *args, **opts)
+    def __call__(self, *args, **opts):
+        #hits with a single dispatched argument are resolved inline, tuple keys of multiple arguments never match an id
+        impl = self._call_lookup(id(args[0].__class__))
+        if impl is None:
+            impl = self._fast_resolve(*args)
+        return impl(*args, **opts)
+
+    def enable_stats(self):
+        """ Start recording, for each concrete argument type, calls, cache hits and misses, fallbacks to :meth:`default_function`, 
+        :data:`__mro__` entries walked on misses and cumulative handler time.
+
+        The dispatcher class is swapped with an instrumented subclass, so that disabled stats have no cost at all.
+        """
+        if not isinstance(self, _StatsMixin):
+            try:
+                cls = _stats_classes[self.__class__]
+            except KeyError:
+                cls = _stats_classes[self.__class__] = type(
+                    self.__class__.__name__, (_StatsMixin, self.__class__), {})
+            self.__class__ = cls
+
+    def disable_stats(self):
+        """ Stop recording and restore the original dispatcher class. Recorded stats are kept. """
+        if isinstance(self, _StatsMixin):
+            self.__class__ = self.__class__.__bases__[1]
+            self._bind_resolve()
+
+    def reset_stats(self):
+        self.dispatch_dict_cache.clear_stats()
+
+    def stats(self):
+        """ Return a snapshot of the recorded stats as a :class:`dict` mapping types to records.
+
+        Records are stored in the resolution cache, keyed on class ids, and dropped when a class is garbage collected. """
+        cache = self.dispatch_dict_cache
+        stats = {}
+        for key, record in tuple(cache.stats.items()):
+            types = cache.types(key)
+            if types is not None:
+                stats[types] = data(record)
+        return stats
+
+    def stats_report(self):
+        """ Return the recorded stats as a text table, hottest types first. """
+        rows = [('type', 'calls', 'hits', 'misses', 'defaults', 'mro', 'time (ms)')]
+        for key, record in sorted(
+                self.stats().items(), key = lambda item: -item[1].calls):
+            rows.append((
+                _type_name(key),
+                record.calls,
+                record.hits,
+                record.misses,
+                record.defaults,
+                record.mro_depth,
+                '%.3f' % (record.time * 1000),
+            ))
+
+        widths = [max(len(str(row[i])) for row in rows) for i in range(len(rows[0]))]
+        return "\n".join(
+            "  ".join(
+                i and str(value).rjust(width) or str(value).ljust(width)
+                for i, (value, width) in enumerate(zip(row, widths)))
+            for row in rows
+        )
 
     def as_method(self):
         """ Return the dispatch as a class method. 
@@ -151,7 +658,94 @@ class Dispatch(object):
 
         """
 
-        def method(instance, arg, *args, **opts):
-            return self.resolve(arg)(instance, arg, *args, **opts)
+        def method(instance, *args, **opts):
+            return self.resolve(*args[:self.nargs])(instance, *args, **opts)
 
         return method
+
+
+def _no_lookup(key):
+    return None
+
+
+def _type_name(key):
+    if isinstance(key, tuple):
+        return '(%s)' % ', '.join(map(_type_name, key))
+    return key.__name__
+
+
+def _mro_depth(key, dispatch_dict):
+    if isinstance(key, tuple):
+        return sum(len(cls.__mro__) for cls in key)
+    for depth, t in enumerate(key.__mro__, 1):
+        if t in dispatch_dict:
+            return depth
+    return depth
+
+
+_stats_classes = {}
+
+def _new_record():
+    return data(calls = 0, hits = 0, misses = 0, defaults = 0, mro_depth = 0, time = 0.)
+
+class _StatsMixin(object):
+    """ Instrumented resolution installed by :meth:`Dispatch.enable_stats`. """
+
+    def __call__(self, *args, **opts):
+        return self.resolve(*args)(*args, **opts)
+
+    def _stats_key(self, args):
+        if self.nargs == 1:
+            return args[0].__class__
+        return tuple(arg.__class__ for arg in args[:self.nargs])
+
+    def _map_group(self, cls, group, args, opts):
+        #every item is recorded as a call, like when the dispatcher is called directly
+        batch = self._resolve_group_batch(cls, args)
+        if batch is None:
+            return [self(item, *args, **opts) for item in group]
+
+        record = self.dispatch_dict_cache.record(self._stats_key((group[0], ) + args), _new_record)
+        defaults = record.defaults
+        self.resolve(group[0], *args)
+
+        rest = len(group) - 1
+        record.calls += rest
+        record.hits += rest
+        if record.defaults > defaults:
+            record.defaults += rest
+
+        t = time.perf_counter()
+        try:
+            return self._call_batch(batch, cls, group, args, opts)
+        finally:
+            record.time += time.perf_counter() - t
+
+    def resolve(self, *args):
+        key = self._stats_key(args)
+
+        record = self.dispatch_dict_cache.record(key, _new_record)
+
+        record.calls += 1
+
+        impl = self.dispatch_dict_cache.lookup(key)
+        if impl is None:
+            record.misses += 1
+            record.mro_depth += _mro_depth(key, self.dispatch_dict)
+            impl = super(_StatsMixin, self).resolve(*args[:self.nargs])
+        else:
+            record.hits += 1
+            if self._resolve_overridden:
+                impl = super(_StatsMixin, self).resolve(*args[:self.nargs])
+
+        if impl == self.default_function:
+            record.defaults += 1
+
+        def timed(*args, **opts):
+            t = time.perf_counter()
+            try:
+                return impl(*args, **opts)
+            finally:
+                record.time += time.perf_counter() - t
+
+        return timed
@@ -2,6 +2,11 @@
 
 from __future__ import absolute_import, print_function, unicode_literals
 
+import codecs
+from array import array
+from functools import partial
+from itertools import accumulate
+
 from rpy.functions import six
 
 
@@ -70,3 +75,178 @@ def safe_force_text(obj):
         return force_text(obj, errors='ignore')
     except Exception as e:
         return '<unprintable obj: %s>' % e
+
+
+def _text_converter(cls, encoding, errors):
+    #returns None when values of cls are returned as they are
+    if issubclass(cls, six.text_type):
+        return None
+    if issubclass(cls, bytes):
+        if encoding == 'utf-8' and errors == 'strict':
+            return bytes.decode
+        return partial(bytes.decode, encoding=encoding, errors=errors)
+    return six.text_type
+
+
+def _bytes_converter(cls, encoding, errors):
+    if issubclass(cls, bytes):
+        if encoding == 'utf-8':
+            return None
+        return partial(force_bytes, encoding=encoding, errors=errors)
+    if issubclass(cls, six.buffer_types):
+        return bytes
+    if issubclass(cls, six.text_type):
+        if encoding == 'utf-8' and errors == 'strict':
+            return six.text_type.encode
+        return partial(six.text_type.encode, encoding=encoding, errors=errors)
+    return partial(force_bytes, encoding=encoding, errors=errors)
+
+
+def _convert_many(values, converter, encoding, errors):
+    values = list(values)
+    types = set(map(type, values))
+
+    if len(types) == 1:
+        #the common case of a column with a single type is converted with a single map
+        function = converter(types.pop(), encoding, errors)
+        if function is None:
+            return values
+        return list(map(function, values))
+
+    converters = {}
+    for cls in types:
+        converters[cls] = converter(cls, encoding, errors) or _identity
+    return [converters[type(value)](value) for value in values]
+
+
+def _identity(value):
+    return value
+
+
+def force_text_many(values, encoding='utf-8', errors='strict'):
+    """ Same as :func:`force_text` for every value, returning a list.
+
+    The conversion is chosen once for each distinct type, text values are returned as they are. """
+    return _convert_many(values, _text_converter, encoding, errors)
+
+
+def force_bytes_many(values, encoding='utf-8', errors='strict'):
+    """ Same as :func:`force_bytes` for every value, returning a list.
+
+    The conversion is chosen once for each distinct type, bytes values are returned as they are. """
+    return _convert_many(values, _bytes_converter, encoding, errors)
+
+
+def _convert_columns(rows, convert, encoding, errors):
+    rows = list(rows)
+    if not rows:
+        return []
+    if len(set(map(len, rows))) > 1:
+        raise ValueError('All rows must have the same length')
+    return list(zip(*(convert(column, encoding, errors) for column in zip(*rows))))
+
+
+def force_text_columns(rows, encoding='utf-8', errors='strict'):
+    """ Convert a table with :func:`force_text_many` column by column, returning a list of tuples.
+    Values in a column usually have the same type, which is converted with a single map. """
+    return _convert_columns(rows, force_text_many, encoding, errors)
+
+
+def force_bytes_columns(rows, encoding='utf-8', errors='strict'):
+    """ Same as :func:`force_text_columns` using :func:`force_bytes_many`. """
+    return _convert_columns(rows, force_bytes_many, encoding, errors)
+
+
+def force_bytes_joined(values, encoding='utf-8', errors='strict'):
+    """ Convert values with :func:`force_bytes_many`, returning a single :class:`bytes` and an :class:`array.array` of offsets,
+    the value at index `i` is :code:`buffer[offsets[i]:offsets[i + 1]]`. """
+    values = force_bytes_many(values, encoding, errors)
+    return b''.join(values), array('Q', accumulate(map(len, values), initial=0))
+
+
+#utf-32 boms start with the utf-16 ones and must be checked first
+_boms = (
+    (codecs.BOM_UTF32_LE, 'utf-32-le'),
+    (codecs.BOM_UTF32_BE, 'utf-32-be'),
+    (codecs.BOM_UTF8, 'utf-8'),
+    (codecs.BOM_UTF16_LE, 'utf-16-le'),
+    (codecs.BOM_UTF16_BE, 'utf-16-be'),
+)
+
+
+def sniff_encoding(prefix, default='utf-8'):
+    """ Return the encoding of the byte order mark at the start of `prefix` and the length of the mark,
+    or `default` and 0 when there is no mark. """
+    for bom, encoding in _boms:
+        if prefix.startswith(bom):
+            return encoding, len(bom)
+    return default, 0
+
+
+class StreamDecoder(object):
+    """ Decode bytes arriving in chunks, multibyte sequences split between chunks are decoded once complete.
+
+    When `sniff_bom` is :data:`True` a byte order mark at the start of the stream is removed and its encoding is used instead of `encoding`.
+    """
+
+    def __init__(self, encoding='utf-8', errors='strict', sniff_bom=True):
+        self.encoding = encoding
+        self.errors = errors
+        self.sniff_bom = sniff_bom
+        self.prefix = b''
+        self.decoder = None
+        if not sniff_bom:
+            self.decoder = codecs.getincrementaldecoder(encoding)(errors)
+
+    def decode(self, chunk, final=False):
+        if self.decoder is None:
+            #the longest byte order mark is 4 bytes
+            self.prefix += chunk
+            if len(self.prefix) < 4 and not final:
+                return ''
+            self.encoding, skip = sniff_encoding(self.prefix, self.encoding)
+            self.decoder = codecs.getincrementaldecoder(self.encoding)(self.errors)
+            chunk, self.prefix = self.prefix[skip:], b''
+        return self.decoder.decode(chunk, final)
+
+
+class StreamEncoder(object):
+    """ Encode text arriving in chunks, see :class:`StreamDecoder`. """
+
+    def __init__(self, encoding='utf-8', errors='strict'):
+        self.encoding = encoding
+        self.errors = errors
+        self.encoder = codecs.getincrementalencoder(encoding)(errors)
+
+    def encode(self, chunk, final=False):
+        return self.encoder.encode(chunk, final)
+
+
+def iter_decode(chunks, encoding='utf-8', errors='strict', sniff_bom=True):
+    """ Turn an iterable of byte chunks in an iterator of text chunks, using constant memory, see :class:`StreamDecoder`. """
+    decoder = StreamDecoder(encoding, errors, sniff_bom)
+    for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    text = decoder.decode(b'', final=True)
+    if text:
+        yield text
+
+
+def iter_encode(chunks, encoding='utf-8', errors='strict'):
+    """ Turn an iterable of text chunks in an iterator of byte chunks, see :class:`StreamEncoder`. """
+    encoder = StreamEncoder(encoding, errors)
+    for chunk in chunks:
+        encoded = encoder.encode(chunk)
+        if encoded:
+            yield encoded
+    encoded = encoder.encode('', final=True)
+    if encoded:
+        yield encoded
+
+
+def iter_chunks(stream, size=1024 * 1024):
+    """ Read a binary file in chunks of `size` bytes. """
+    return iter(partial(stream.read, size), b'')
+
@@ -2,12 +2,13 @@
 
 from __future__ import absolute_import, print_function, unicode_literals
 
-import inspect
-from collections import OrderedDict
-from functools import reduce
+from array import array
+from collections.abc import Mapping
+from functools import update_wrapper
 from itertools import islice
 
 from rpy.functions import six
+from rpy.functions.datastructures import SequenceView
 
 
 def partial(f, *args, **opts):
@@ -32,36 +33,113 @@ def last(iterable, default=None):
 def identity(x):
     return x
 
+def _compose(first, *rest):
+    #specialized closures, a python level loop or a callable object cost more than the calls themselves for short pipelines
+    if len(rest) == 1:
+        second, = rest
+        def composed(*args, **opts):
+            return second(first(*args, **opts))
+    else:
+        def composed(*args, **opts):
+            value = first(*args, **opts)
+            for function in rest:
+                value = function(value)
+            return value
+    return composed
+
+_composition_codes = frozenset(
+    _compose(*functions).__code__
+    for functions in ((identity, identity), (identity, identity, identity))
+)
+
+def is_composition(function):
+    return getattr(function, '__code__', None) in _composition_codes
+
 def composition(*functions):
-    return reduce(
-        lambda f, g: lambda *args, **kw: f(g(*args, **kw)),
-        reversed(functions or (identity, ))
-    )
+    """ Return a function applying `functions` from left to right, the first one receives all the arguments and each other one the previous result.
+
+    Functions are stored flat in the :data:`functions` attribute and applied in a single frame, compositions given as arguments are flattened.
+    The result takes :data:`__name__`, :data:`__doc__` and :data:`__wrapped__` from the first function.
+    """
+    flat = []
+    for function in functions:
+        if is_composition(function):
+            flat.extend(function.functions)
+        else:
+            flat.append(function)
+
+    if not flat:
+        return identity
+    if len(flat) == 1:
+        return flat[0]
+
+    composed = update_wrapper(_compose(*flat), flat[0], updated=())
+    composed.functions = tuple(flat)
+    return composed
+
+
+_buffer_types = tuple(six.buffer_types) + (array, )
+
+_iterable_types = {}
+
+def _is_iterable_type(cls):
+    #iterability only depends on the concrete type, classes are never considered iterable.
+    #the cache is bounded to avoid keeping dynamically created classes alive
+    if len(_iterable_types) >= 1024:
+        _iterable_types.clear()
+    value = _iterable_types[cls] = not issubclass(cls, type) and not issubclass(cls, six.string_types) and hasattr(cls, '__iter__')
+    return value
 
 
 def is_iterable(obj, exclude_list=six.string_types):
+    if exclude_list is six.string_types:
+        value = _iterable_types.get(obj.__class__, None)
+        if value is None:
+            return _is_iterable_type(obj.__class__)
+        return value
     if isinstance(obj, exclude_list):
         return False
-    return not inspect.isclass(obj) and hasattr(obj, '__iter__')
+    return not isinstance(obj, type) and hasattr(obj, '__iter__')
 
 
 def iterate(*args):
     for arg in args:
-        if not is_iterable(arg):
-            yield arg
-        else:
-            for item in arg:
-                yield item
-
-
-def flatten(*args):
-    for arg in args:
-        if is_iterable(arg):
-            for sub in arg:
-                for el in flatten(sub):
-                    yield el
+        cls = arg.__class__
+        if cls is list or cls is tuple:
+            yield from arg
         else:
+            value = _iterable_types.get(cls, None)
+            if value is None:
+                value = _is_iterable_type(cls)
+            if value:
+                yield from arg
+            else:
+                yield arg
+
+
+def flatten(*args, max_depth=None):
+    """ Yield the items of `args`, recursively expanding iterables that are not strings.
+
+    Nested iterables are expanded using an explicit stack, so deep inputs do not hit the recursion limit.
+    `max_depth` limits the number of nested levels expanded, :code:`flatten(*args, max_depth=1)` is equivalent to :code:`iterate(*args)`.
+    """
+    stack = [iter(args)]
+    while stack:
+        for arg in stack[-1]:
+            if max_depth is None or len(stack) <= max_depth:
+                cls = arg.__class__
+                if cls is list or cls is tuple:
+                    stack.append(iter(arg))
+                    break
+                value = _iterable_types.get(cls, None)
+                if value is None:
+                    value = _is_iterable_type(cls)
+                if value:
+                    stack.append(iter(arg))
+                    break
             yield arg
+        else:
+            stack.pop()
 
 
 def riffle(iterable, separator):
@@ -75,18 +153,73 @@ def riffle(iterable, separator):
         pass
 
 
-def partition(iterable, n):
-    """ Yield successive n-sized chunks from l. """
+def _slicer(sequence):
+    def slicer(start, stop):
+        return sequence[start:stop]
+    return slicer
+
+
+def _sliceable(iterable):
+    if isinstance(iterable, (list, tuple)):
+        return partial(SequenceView, iterable)
+    if isinstance(iterable, _buffer_types):
+        return _slicer(memoryview(iterable))
+    if hasattr(iterable, '__len__') and hasattr(iterable, '__getitem__') and not isinstance(iterable, Mapping):
+        try:
+            iterable[0:0]
+        except (TypeError, KeyError):
+            return None
+        return _slicer(iterable)
+    return None
+
+
+def partition(iterable, n, copy=True):
+    """ Yield successive n-sized chunks from l. 
+
+    Chunks are tuples, and the input is consumed as a stream. With :code:`copy=False`, inputs that can be sliced are not copied: 
+    :class:`bytes`, :class:`bytearray`, :class:`memoryview` and :class:`array.array` yield :class:`memoryview` slices,
+    :class:`list` and :class:`tuple` yield :class:`~rpy.functions.datastructures.SequenceView` objects 
+    and other sequences, like NumPy arrays, yield their own slices.
+
+    `n` must be a positive integer, otherwise :class:`ValueError` is raised in both modes.
+    """
+    if n < 1:
+        raise ValueError('n must be a positive integer, got %s' % n)
+
+    if not copy:
+        chunk = _sliceable(iterable)
+        if chunk is not None:
+            for start in range(0, len(iterable), n):
+                yield chunk(start, start + n)
+            return
+
     iterable = iter(iterable)
     res = tuple(islice(iterable, n))
     while len(res) != 0:
         yield res
         res = tuple(islice(iterable, n))
 
-def delete_duplicates(iterable, key = identity):
-    d = OrderedDict()
+def iter_delete_duplicates(iterable, key = identity, seen = None):
+    """ Yield the first occurrence of each element as soon as it is found. 
+
+    Only keys are retained, in `seen`, which defaults to a :class:`set`. Any object implementing :code:`in` and :code:`add` can be used,
+    i.e. :class:`~rpy.functions.datastructures.SpillSet` to move keys on disk, 
+    or :class:`~rpy.functions.datastructures.BloomFilter` for approximate deduplication in constant memory.
+    When `seen` has a true :code:`add_returns_new` attribute, only :code:`add` is called and its result tells whether the key was new.
+    """
+    if seen is None:
+        seen = set()
+    if getattr(seen, 'add_returns_new', False):
+        add = seen.add
+        for el in iterable:
+            if add(key(el)):
+                yield el
+        return
     for el in iterable:
         k = key(el)
-        if not k in d:
-            d[k] = el
-    return tuple(d.values())
\ No newline at end of file
+        if not k in seen:
+            seen.add(k)
+            yield el
+
+def delete_duplicates(iterable, key = identity):
+    return tuple(iter_delete_duplicates(iterable, key = key))
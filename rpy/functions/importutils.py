@@ -3,9 +3,12 @@
 from __future__ import absolute_import, print_function, unicode_literals
 
 import os
+import threading
+import time
 from importlib import import_module
 
 from rpy.functions import six
+from rpy.functions.datastructures import data
 
 
 def module_path(module, *args):
@@ -46,17 +49,22 @@ def import_string(dotted_path):
 def import_string_and_call(import_path, *args, **kw):
     return import_string(import_path)(*args, **kw)
 
-def safe_import_string(f):
+def safe_import_string_with_path(f):
+    """ Same as :func:`safe_import_string`, returning the imported object and the path that was imported. """
     if isinstance(f, (list, tuple)):
         for path in f:
             try:
-                return import_string(path)
+                return import_string(path), path
             except ImportError:
                 pass
         raise ImportError('Cannot import %s' % (f, ))
     if isinstance(f, six.string_types):
-        return import_string(f)
-    return f
+        return import_string(f), f
+    return f, None
+
+
+def safe_import_string(f):
+    return safe_import_string_with_path(f)[0]
 
 
 def safe_import_string_and_call(f, *args, **kw):
@@ -64,18 +72,79 @@ def safe_import_string_and_call(f, *args, **kw):
 
 
 class API(object):
+    """ A namespace of objects imported lazily on first access, i.e. :code:`API(loads='json.loads').loads`.
+
+    A tuple of paths is tried in order, and the first one that can be imported is used.
+    Imports are done once even when the same name is accessed from several threads,
+    the time spent importing and the path used are reported by :meth:`stats`.
+    """
+
     def __init__(self, importer=safe_import_string, **mapping):
         self.__dict__['importer'] = importer
         self.__dict__['mapping'] = mapping
         self.__dict__['imports'] = {}
+        self.__dict__['records'] = {}
+        self.__dict__['locks'] = {}
+        self.__dict__['lock'] = threading.Lock()
 
     def __getattr__(self, value):
-        key = self.__dict__['mapping'][value]
         try:
-            return self.__dict__['imports'][key]
+            return self.__dict__['imports'][value]
         except KeyError:
-            self.__dict__['imports'][key] = self.__dict__['importer'](key)
-            return self.__dict__['imports'][key]
+            return self._import(value)
+
+    def _import(self, value):
+        key = self.__dict__['mapping'][value]
+
+        with self.__dict__['lock']:
+            lock = self.__dict__['locks'].setdefault(value, threading.RLock())
+
+        with lock:
+            #another thread might have completed the import while we were waiting
+            try:
+                return self.__dict__['imports'][value]
+            except KeyError:
+                pass
+
+            t = time.perf_counter()
+            try:
+                if self.__dict__['importer'] is safe_import_string:
+                    imported, path = safe_import_string_with_path(key)
+                else:
+                    imported, path = self.__dict__['importer'](key), None
+            except Exception as e:
+                self.__dict__['records'][value] = data(
+                    time = time.perf_counter() - t, path = None, error = e)
+                raise
+
+            self.__dict__['records'][value] = data(
+                time = time.perf_counter() - t, path = path, error = None)
+            self.__dict__['imports'][value] = imported
+            return imported
+
+    def stats(self):
+        """ Return a record for each name that was accessed, with the import time in seconds, the path that was imported and the last error,
+        slowest imports first. """
+        return tuple(
+            data(name = name, **record)
+            for name, record in sorted(
+                tuple(self.__dict__['records'].items()),
+                key = lambda item: item[1].time,
+                reverse = True)
+        )
+
+    def preload(self, *keys, workers=None):
+        """ Import `keys`, by default all names, in a background thread pool, returning a dict of futures by name.
+
+        Errors are not raised here, they are raised again when the name is accessed. """
+        from concurrent.futures import ThreadPoolExecutor
+
+        keys = keys or tuple(self)
+        pool = ThreadPoolExecutor(workers or min(8, len(keys) or 1))
+        try:
+            return dict((key, pool.submit(getattr, self, key)) for key in keys)
+        finally:
+            pool.shutdown(wait=False)
 
     def __getitem__(self, key):
         try:
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import os
+import time
+from array import array
+from collections import deque
+from concurrent.futures import (FIRST_COMPLETED, Executor, ProcessPoolExecutor,
+                                ThreadPoolExecutor, wait)
+
+from rpy.functions import six
+from rpy.functions.functional import first, partition
+
+
+class SharedBuffer(object):
+    """ A picklable reference to a buffer copied in :class:`multiprocessing.shared_memory.SharedMemory`.
+
+    The worker receives a :class:`memoryview` of the shared memory instead of a copy of the payload,
+    the view is only valid while the function is running.
+    """
+
+    def __init__(self, name, nbytes, format):
+        self.name = name
+        self.nbytes = nbytes
+        self.format = format
+
+    @classmethod
+    def create(cls, value):
+        from multiprocessing.shared_memory import SharedMemory
+
+        view = memoryview(value).cast('B')
+        shm = SharedMemory(create=True, size=max(1, view.nbytes))
+        shm.buf[:view.nbytes] = view
+        return shm, cls(shm.name, view.nbytes, memoryview(value).format)
+
+    def call(self, function):
+        from multiprocessing.shared_memory import SharedMemory
+
+        try:
+            shm = SharedMemory(name=self.name, track=False)
+        except TypeError:
+            #track was introduced in py3.13
+            shm = SharedMemory(name=self.name)
+
+        view = shm.buf[:self.nbytes]
+        if not self.format == 'B':
+            view = view.cast(self.format)
+        try:
+            return function(view)
+        finally:
+            try:
+                view.release()
+                shm.close()
+            except BufferError:
+                #the function kept a reference to the buffer, the mapping is released when the reference goes away
+                pass
+
+
+def _call_chunk(function, chunk):
+    t = time.perf_counter()
+    results = tuple(
+        item.call(function) if isinstance(item, SharedBuffer) else function(item)
+        for item in chunk
+    )
+    return time.perf_counter() - t, results
+
+
+_shareable_types = tuple(six.buffer_types) + (array, )
+
+
+class _Chunks(object):
+
+    def __init__(self, iterable, chunksize, target_time, max_chunksize):
+        self.iterator = iter(iterable)
+        self.chunksize = chunksize or 1
+        self.adaptive = not chunksize
+        self.target_time = target_time
+        self.max_chunksize = max_chunksize
+        self.item_time = None
+
+    def measure(self, elapsed, size):
+        if not self.adaptive or not size:
+            return
+        item_time = elapsed / size
+        if self.item_time is None:
+            self.item_time = item_time
+        else:
+            self.item_time = 0.7 * self.item_time + 0.3 * item_time
+        self.chunksize = max(1, min(
+            self.max_chunksize,
+            int(self.target_time / max(self.item_time, 1e-9))))
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        chunk = first(partition(self.iterator, self.chunksize))
+        if chunk is None:
+            raise StopIteration
+        return chunk
+
+
+def pimap(function, iterable, workers=None, ordered=True, chunksize=None, max_pending=None,
+          target_time=0.05, max_chunksize=10000, shared_memory_threshold=None, executor=None, thread=False):
+    """ Apply `function` to every item of `iterable` in a pool of processes, yielding results as they are available.
+
+    Items are sent to workers in chunks. When `chunksize` is not given the size is adapted to the measured time per item,
+    aiming at chunks taking about `target_time` seconds.
+    At most `max_pending` chunks, by default twice the number of workers, are in flight, the input is not read further ahead.
+
+    With :code:`ordered=False` results are yielded in completion order, which avoids waiting for slow chunks.
+
+    When `shared_memory_threshold` is set, in a process pool :class:`bytes`, :class:`bytearray`, :class:`memoryview` and :class:`array.array` items
+    larger than the threshold are transferred using shared memory instead of pickling. `function` then receives a :class:`memoryview`
+    instead of the original item, so it must accept one, i.e. :code:`bytes.upper` does not.
+
+    `function` must be picklable when using processes. Set `thread` to use a thread pool, or pass an existing :class:`~concurrent.futures.Executor`.
+    """
+
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * workers
+
+    if executor is None:
+        pool = (thread and ThreadPoolExecutor or ProcessPoolExecutor)(workers)
+    elif isinstance(executor, Executor):
+        pool = executor
+        thread = isinstance(executor, ThreadPoolExecutor)
+    else:
+        raise ValueError('%s is not an instance of Executor' % executor)
+
+    chunks = _Chunks(iterable, chunksize, target_time, max_chunksize)
+    pending = deque()
+    exhausted = False
+
+    def submit():
+        chunk = next(chunks)
+        shared = []
+        if not thread and shared_memory_threshold is not None:
+            items = []
+            for item in chunk:
+                if isinstance(item, _shareable_types) and memoryview(item).nbytes >= shared_memory_threshold:
+                    shm, item = SharedBuffer.create(item)
+                    shared.append(shm)
+                items.append(item)
+            chunk = tuple(items)
+        pending.append((pool.submit(_call_chunk, function, chunk), len(chunk), shared))
+
+    def release(shared):
+        for shm in shared:
+            shm.close()
+            shm.unlink()
+
+    try:
+        while True:
+
+            while not exhausted and len(pending) < max_pending:
+                try:
+                    submit()
+                except StopIteration:
+                    exhausted = True
+
+            if not pending:
+                return
+
+            if ordered:
+                future, size, shared = pending.popleft()
+            else:
+                done, _ = wait(tuple(future for future, size, shared in pending), return_when=FIRST_COMPLETED)
+                for i, (future, size, shared) in enumerate(pending):
+                    if future in done:
+                        del pending[i]
+                        break
+
+            try:
+                elapsed, results = future.result()
+            finally:
+                release(shared)
+
+            chunks.measure(elapsed, size)
+
+            yield from results
+
+    finally:
+        for future, size, shared in pending:
+            future.cancel()
+        if executor is None:
+            pool.shutdown(wait=True)
+        for future, size, shared in pending:
+            release(shared)
+
+
+def pmap(function, iterable, **opts):
+    """ Same as :func:`pimap`, returning a :class:`tuple`. """
+    return tuple(pimap(function, iterable, **opts))
+
+
+def timap(function, iterable, **opts):
+    """ Same as :func:`pimap` using a thread pool, for I/O bound functions. """
+    return pimap(function, iterable, thread=True, **opts)
+
+
+def tmap(function, iterable, **opts):
+    """ Same as :func:`timap`, returning a :class:`tuple`. """
+    return tuple(timap(function, iterable, **opts))
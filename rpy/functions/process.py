@@ -3,21 +3,210 @@
 from __future__ import absolute_import, print_function, unicode_literals
 
 import os
-import subprocess
 
-from rpy.functions.functional import iterate, partial
+from rpy.functions.datastructures import data
+from rpy.functions.functional import iterate
 
-process = partial(
-    subprocess.Popen,
-    stdout = subprocess.PIPE,
-    stdin  = subprocess.PIPE,
-    stderr = subprocess.STDOUT
-)
+
+def process(*args, **opts):
+    import subprocess
+
+    opts.setdefault('stdout', subprocess.PIPE)
+    opts.setdefault('stdin', subprocess.PIPE)
+    opts.setdefault('stderr', subprocess.STDOUT)
+    return subprocess.Popen(*args, **opts)
 
 def _auto_expand(path):
     if path.startswith("~"):
         return os.path.realpath(os.path.expanduser(path))
     return path
 
+def user_cache_path(*args):
+    """ Return a path inside the rpy folder of the user cache, :code:`$XDG_CACHE_HOME/rpy` or :code:`~/.cache/rpy`. """
+    return os.path.join(
+        os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+        'rpy',
+        *args)
+
+def command(*args):
+    """ Return the arguments of a command as a tuple, flattening iterables and expanding paths starting with ~. """
+    return tuple(map(_auto_expand, iterate(*args)))
+
 def system_open(path, cmd = "open"):
-    return process(tuple(iterate((cmd, ), map(_auto_expand, iterate(path)))))
+    return process(command(cmd, path))
+
+
+class ProcessPool(object):
+    """ Run commands with asyncio, with at most `concurrency` processes running at the same time.
+
+    Arguments are handled by :func:`command`. The output is the stdout of the process, merged with stderr like in :func:`process`.
+    Processes running for more than `timeout` seconds are terminated, and killed if they are still alive after `kill_timeout` seconds.
+    On posix each process starts a new session, so that the children it spawned are terminated together with it.
+    """
+
+    def __init__(self, concurrency=None, timeout=None, kill_timeout=5):
+        self.concurrency = concurrency or os.cpu_count() or 1
+        self.timeout = timeout
+        self.kill_timeout = kill_timeout
+        self.semaphore = None
+
+    def get_semaphore(self):
+        import asyncio
+
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.concurrency)
+        return self.semaphore
+
+    async def spawn(self, args):
+        import asyncio
+        import subprocess
+
+        return await asyncio.create_subprocess_exec(
+            *args,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            start_new_session=os.name == 'posix')
+
+    def signal(self, proc, kill=False):
+        """ Terminate or kill the process group of `proc`, ignoring processes that already exited. """
+        import signal
+
+        try:
+            if os.name == 'posix':
+                os.killpg(proc.pid, kill and signal.SIGKILL or signal.SIGTERM)
+            elif kill:
+                proc.kill()
+            else:
+                proc.terminate()
+        except ProcessLookupError:
+            #the process exited in the meantime
+            pass
+
+    async def kill(self, proc):
+        import asyncio
+
+        if proc.returncode is not None:
+            #children can outlive the process and keep the output open
+            self.signal(proc)
+            return proc.returncode
+        self.signal(proc)
+        try:
+            return await asyncio.wait_for(proc.wait(), self.kill_timeout)
+        except asyncio.TimeoutError:
+            self.signal(proc, kill=True)
+        return await proc.wait()
+
+    async def read(self, stream, buffer):
+        while True:
+            chunk = await stream.read(2 ** 16)
+            if not chunk:
+                break
+            buffer.extend(chunk)
+
+    async def run(self, *args, timeout=None):
+        """ Run a command, returning a :class:`~rpy.functions.datastructures.data` with args, returncode, output, elapsed and timed_out. """
+        import asyncio
+        import time
+
+        args = command(*args)
+        timeout = timeout or self.timeout
+
+        async with self.get_semaphore():
+            loop = asyncio.get_event_loop()
+            deadline = timeout and loop.time() + timeout or None
+
+            def remaining():
+                if deadline is None:
+                    return None
+                return max(0, deadline - loop.time())
+
+            started = time.perf_counter()
+            proc = await self.spawn(args)
+            buffer = bytearray()
+            output = asyncio.ensure_future(self.read(proc.stdout, buffer))
+            timed_out = False
+            try:
+                #the timeout covers the process, which can close its output and keep running
+                await asyncio.wait_for(asyncio.shield(output), remaining())
+                returncode = await asyncio.wait_for(proc.wait(), remaining())
+            except asyncio.TimeoutError:
+                timed_out = True
+                returncode = await self.kill(proc)
+            finally:
+                if proc.returncode is None:
+                    await self.kill(proc)
+
+            if timed_out:
+                #a child that escaped the kill can keep the output open, keep what was read so far
+                try:
+                    await asyncio.wait_for(output, self.kill_timeout)
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                await output
+
+            return data(
+                args = args,
+                returncode = returncode,
+                output = bytes(buffer),
+                elapsed = time.perf_counter() - started,
+                timed_out = timed_out)
+
+    async def lines(self, *args, timeout=None, check=True, encoding='utf-8', errors='replace'):
+        """ Yield the lines of output of a command as they are written.
+
+        When `check` is :data:`True` a non zero exit code raises :class:`subprocess.CalledProcessError` after the last line,
+        a timeout raises :class:`asyncio.TimeoutError`. """
+        import asyncio
+        import subprocess
+
+        args = command(*args)
+        timeout = timeout or self.timeout
+
+        async with self.get_semaphore():
+            loop = asyncio.get_event_loop()
+            deadline = timeout and loop.time() + timeout or None
+
+            def remaining():
+                if deadline is None:
+                    return None
+                return max(0, deadline - loop.time())
+
+            proc = await self.spawn(args)
+            try:
+                while True:
+                    line = await asyncio.wait_for(proc.stdout.readline(), remaining())
+                    if not line:
+                        break
+                    yield line.decode(encoding, errors)
+                returncode = await asyncio.wait_for(proc.wait(), remaining())
+            finally:
+                if proc.returncode is None:
+                    await self.kill(proc)
+
+        if check and returncode:
+            raise subprocess.CalledProcessError(returncode, args)
+
+    async def as_completed(self, commands, timeout=None):
+        """ Run all `commands`, yielding :code:`(index, result)` pairs as they complete, see :meth:`run`. """
+        from rpy.functions.asyncio import as_completed_all
+
+        async for pair in as_completed_all(
+                (self.run(args, timeout=timeout) for args in commands), concurrency=self.concurrency):
+            yield pair
+
+    async def map(self, commands, timeout=None):
+        """ Run all `commands`, returning a list of results in the same order, see :meth:`run`. """
+        from rpy.functions.asyncio import wait_all
+
+        return await wait_all(
+            (self.run(args, timeout=timeout) for args in commands), concurrency=self.concurrency)
+
+
+def run_processes(commands, concurrency=None, timeout=None, kill_timeout=5, loop=None):
+    """ Same as :meth:`ProcessPool.map` for synchronous code, returning a tuple of results. """
+    from rpy.functions.asyncio import get_event_loop
+
+    pool = ProcessPool(concurrency=concurrency, timeout=timeout, kill_timeout=kill_timeout)
+    return tuple(get_event_loop(loop).run_until_complete(pool.map(commands)))
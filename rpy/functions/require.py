@@ -2,27 +2,116 @@
 
 from __future__ import absolute_import, print_function, unicode_literals
 
+import json
+import os
+import sys
+import zlib
 from functools import wraps
 
-from rpy.functions.api import pip
+from rpy.functions.process import user_cache_path
 
 
 def installed_modules():
-    return {i.key: i.version for i in pip.get_installed_distributions()}
+    from importlib.metadata import distributions
 
+    return {
+        dist.metadata['Name'].lower(): dist.version
+        for dist in distributions()
+        if dist.metadata['Name']
+    }
 
-def missing_requirements(*modules):
 
-    distributions = installed_modules()
+def installed_version(name):
+    """ Return the installed version of the distribution `name`, or :data:`None`. """
+    from importlib.metadata import PackageNotFoundError, version
+
+    try:
+        return version(name)
+    except PackageNotFoundError:
+        return None
+
+
+def _mtime(entry):
+    try:
+        return os.stat(entry or '.').st_mtime_ns
+    except OSError:
+        return None
+
+
+def _distribution_paths():
+    #the first entry is the folder of the script, or the working directory, which changes with every run and holds no distributions
+    paths = sys.path
+    if paths and not getattr(sys.flags, 'safe_path', False):
+        paths = paths[1:]
+    return [entry for entry in paths if entry and not entry == '.']
+
+
+def path_key():
+    """ Return the entries of :data:`sys.path` with their mtimes, which change when distributions are installed or removed.
+
+    The script folder, or the working directory, is not part of the key. """
+    return [sys.executable] + [[entry, _mtime(entry)] for entry in _distribution_paths()]
+
+
+def _read_satisfied(path, key):
+    try:
+        with open(path, 'r') as stream:
+            cached = json.load(stream)
+    except (OSError, ValueError):
+        return set()
+    if not isinstance(cached, dict) or not cached.get('key') == key:
+        return set()
+    return set(cached.get('satisfied', ()))
+
+
+def _write_satisfied(path, key, satisfied):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp = '%s.%s.tmp' % (path, os.getpid())
+        with open(temp, 'w') as stream:
+            json.dump({'key': key, 'satisfied': sorted(satisfied)}, stream)
+        os.replace(temp, path)
+    except OSError:
+        pass
+
+
+def missing_requirements(*modules, cache=None):
+    """ Yield a pip requirement for every module that is not installed, modules are names or (name, version) pairs.
+
+    Satisfied requirements are stored in `cache`, by default in the user cache folder, and are not checked again
+    until an entry of :data:`sys.path` changes. Pass :code:`cache=False` to always check. """
+
+    if cache is None:
+        cache = user_cache_path(
+            'requirements-%08x.json' % zlib.crc32(sys.executable.encode('utf-8')))
+
+    key = cache and path_key()
+    satisfied = cache and _read_satisfied(cache, key) or set()
+    found = set()
 
     for module in modules:
         version = None
         if isinstance(module, (tuple, list)):
             module, version = module
 
-        if not module in distributions or version and not distributions[
-                module] == version:
-            yield version and "%s==%s" % (module, version) or module
+        requirement = version and "%s==%s" % (module, version) or module
+
+        if requirement in satisfied:
+            continue
+
+        installed = installed_version(module)
+
+        if installed is None or version and not installed == version:
+            yield requirement
+        else:
+            found.add(requirement)
+
+    if cache and found:
+        _write_satisfied(cache, key, satisfied | found)
+
+
+def running_under_virtualenv():
+    return hasattr(sys, 'real_prefix') or not sys.prefix == getattr(sys, 'base_prefix', sys.prefix)
 
 
 def require_module(*modules):
@@ -31,12 +120,18 @@ def require_module(*modules):
 
     if commands:
 
+        import importlib
+        import subprocess
+
         print("Update in progress: pip install %s --user" % " ".join(commands))
 
-        if pip.running_under_virtualenv():
-            pip.main(["install"] + commands)
+        #pip has no public python api, it's executed in a subprocess
+        if running_under_virtualenv():
+            subprocess.check_call([sys.executable, '-m', 'pip', 'install'] + commands)
         else:
-            pip.main(["install", "--user"] + commands)
+            subprocess.check_call([sys.executable, '-m', 'pip', 'install', '--user'] + commands)
+
+        importlib.invalidate_caches()
 
 
 def require(*modules):
@@ -4,7 +4,6 @@ from __future__ import absolute_import, print_function, unicode_literals
 
 import datetime
 import decimal
-import platform
 import sys
 import types
 from itertools import chain
@@ -14,7 +13,7 @@ from itertools import chain
 PY2 = sys.version_info[0] == 2
 PY3 = sys.version_info[0] == 3
 
-WINDOWS = platform.system() == 'Windows'
+WINDOWS = sys.platform == 'win32'
 
 JYTHON = sys.platform.startswith('java')
 
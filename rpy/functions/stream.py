@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import linecache
+import time
+from itertools import islice
+
+from rpy.functions.datastructures import data
+from rpy.functions.functional import (identity, iter_delete_duplicates,
+                                      partition, riffle)
+
+
+def _fuse(stages):
+    #adjacent map and filter stages are compiled in a single generator, to avoid one generator frame per stage.
+    #the source is generated instead of looping over the stages in a closure, which is 1.5-2x slower in
+    #benchmarks.functional.benchmark_stream, and slower than chained generators.
+    #only the stage indexes are part of the source code, functions are passed in the namespace.
+    #the source is registered in linecache under a descriptive name, so that tracebacks show the fused loop.
+    lines = ['def fused(iterable):', '    for value in iterable:']
+    namespace = {}
+    for i, (name, (function, )) in enumerate(stages):
+        namespace['f%i' % i] = function
+        if name == 'map':
+            lines.append('        value = f%i(value)' % i)
+        else:
+            lines.append('        if not f%i(value):' % i)
+            lines.append('            continue')
+    lines.append('        yield value')
+
+    source = '\n'.join(lines) + '\n'
+    filename = '<fused stream: %s>' % ', '.join(name for name, args in stages)
+    linecache.cache[filename] = (len(source), None, source.splitlines(True), filename)
+
+    exec(compile(source, filename, 'exec'), namespace)
+    return namespace['fused']
+
+
+def _apply(name, args, iterable):
+    if name == 'map':
+        return map(args[0], iterable)
+    if name == 'filter':
+        return filter(args[0], iterable)
+    if name == 'dedupe':
+        return iter_delete_duplicates(iterable, *args)
+    if name == 'chunk':
+        return partition(iterable, *args)
+    if name == 'take':
+        return islice(iterable, *args)
+    if name == 'riffle':
+        return riffle(iterable, *args)
+    raise ValueError('Unknown stage %s' % name)
+
+
+def _pull(iterable, record):
+    iterable = iter(iterable)
+    while True:
+        t = time.perf_counter()
+        try:
+            value = next(iterable)
+        except StopIteration:
+            record.upstream_time += time.perf_counter() - t
+            return
+        record.upstream_time += time.perf_counter() - t
+        record.items_in += 1
+        yield value
+
+
+def _profile(name, args, iterable, record):
+    iterable = iter(_apply(name, args, _pull(iterable, record)))
+    while True:
+        t = time.perf_counter()
+        try:
+            value = next(iterable)
+        except StopIteration:
+            record.time += time.perf_counter() - t
+            return
+        record.time += time.perf_counter() - t
+        record.items_out += 1
+        yield value
+
+
+class Stream(object):
+    """ A lazy pipeline over any iterable, i.e. the rows yielded by :func:`rpy.dataframe.csv.get_csv_rows`::
+
+        Stream(rows).map(f).filter(p).dedupe(key).chunk(n).collect()
+
+    Stages are only recorded, every method returns a new :class:`Stream`.
+    Nothing is read from the source until the stream is iterated, or until :meth:`collect` or :meth:`first` are called.
+    Adjacent :meth:`map` and :meth:`filter` stages are fused in a single loop.
+
+    When `profile` is :data:`True`, stages are run one by one and :meth:`stats` reports, for each stage, the number of items received and produced,
+    and the time spent in the stage, excluding the time spent in previous stages.
+    """
+
+    def __init__(self, source, profile=False, stages=()):
+        self.source = source
+        self.profile = profile
+        self.stages = tuple(stages)
+        self.records = None
+
+    def then(self, name, *args):
+        return self.__class__(
+            self.source, profile=self.profile, stages=self.stages + ((name, args), ))
+
+    def map(self, function):
+        return self.then('map', function)
+
+    def filter(self, predicate):
+        return self.then('filter', predicate)
+
+    def dedupe(self, key=identity, seen=None):
+        """ Drop items with a key already seen, see :func:`~rpy.functions.functional.iter_delete_duplicates`. """
+        return self.then('dedupe', key, seen)
+
+    def chunk(self, n, copy=True):
+        """ Group items in tuples of `n`, see :func:`~rpy.functions.functional.partition`. """
+        return self.then('chunk', n, copy)
+
+    def riffle(self, separator):
+        return self.then('riffle', separator)
+
+    def take(self, n):
+        """ Stop after `n` items, the source is not read further. """
+        return self.then('take', n)
+
+    def blocks(self):
+        """ Yield stages, grouping adjacent map and filter stages in lists. """
+        fusable = []
+        for name, args in self.stages:
+            if name in ('map', 'filter'):
+                fusable.append((name, args))
+            else:
+                if fusable:
+                    yield fusable
+                    fusable = []
+                yield name, args
+        if fusable:
+            yield fusable
+
+    def __iter__(self):
+        iterable = self.source
+
+        if self.profile:
+            self.records = []
+            for name, args in self.stages:
+                record = data(
+                    stage = name, items_in = 0, items_out = 0, time = 0., upstream_time = 0.)
+                self.records.append(record)
+                iterable = _profile(name, args, iterable, record)
+            return iter(iterable)
+
+        for block in self.blocks():
+            if isinstance(block, tuple):
+                iterable = _apply(block[0], block[1], iterable)
+            elif len(block) == 1:
+                iterable = _apply(block[0][0], block[0][1], iterable)
+            else:
+                iterable = _fuse(block)(iterable)
+        return iter(iterable)
+
+    def collect(self, container=tuple):
+        return container(self)
+
+    def first(self, default=None):
+        return next(iter(self), default)
+
+    def stats(self):
+        """ Return one record per stage for the last profiled run, with items_in, items_out and time in seconds. """
+        return tuple(
+            data(
+                stage = record.stage,
+                items_in = record.items_in,
+                items_out = record.items_out,
+                time = record.time - record.upstream_time)
+            for record in self.records or ())
+
+    def __repr__(self):
+        return '<%s: %s>' % (self.__class__.__name__, " | ".join(name for name, args in self.stages))
@@ -5,7 +5,9 @@ from __future__ import absolute_import, print_function, unicode_literals
 import os
 
 from rpy.functions.api import fernet, json
+from rpy.functions.asyncio import run_in_thread, wait_all
 from rpy.functions.datastructures import data
+from rpy.functions.debug import instrument
 from rpy.functions.decorators import to_data
 from rpy.functions.functional import first
 
@@ -33,10 +35,12 @@ class KeyChain(object):
         self.settings = _parse_settings(opts)
         self.default_name = first(self.settings.keys())
 
+    @instrument()
     def loads(self, payload, password):
         return self.serializer.loads(
             self.cypher.loads(payload, password=password))
 
+    @instrument()
     def dumps(self, payload, password):
         return self.cypher.dumps(
             self.serializer.dumps(payload), password=password)
@@ -48,6 +52,7 @@ class KeyChain(object):
     def get_password(self, secret_name, *paths):
         return self.settings[secret_name or self.default_name].password
 
+    @instrument()
     def get_secret(self, key, secret_name=None):
         try:
             with open(self.get_location(secret_name, key), 'rb') as f:
@@ -64,6 +69,7 @@ class KeyChain(object):
         except FileNotFoundError:
             pass
 
+    @instrument()
     def set_secret(self, key, payload, secret_name=None):
         with open(self.get_location(secret_name, key), 'wb') as f:
             f.write(
@@ -82,3 +88,37 @@ class KeyChain(object):
                     yield file.name
         except FileNotFoundError:
             pass
+
+
+class AsyncKeyChain(object):
+    """ A :class:`KeyChain` for asyncio code, file access and decryption are done in the thread pool of the running loop.
+
+    Accepts the same settings as :class:`KeyChain`, or an existing `keychain`.
+    """
+
+    def __init__(self, keychain=None, concurrency=16, **opts):
+        self.keychain = keychain or KeyChain(**opts)
+        self.concurrency = concurrency
+
+    async def get_secret(self, key, secret_name=None):
+        return await run_in_thread(self.keychain.get_secret, key, secret_name=secret_name)
+
+    async def set_secret(self, key, payload, secret_name=None):
+        return await run_in_thread(self.keychain.set_secret, key, payload, secret_name=secret_name)
+
+    async def delete_secret(self, key, secret_name=None):
+        return await run_in_thread(self.keychain.delete_secret, key, secret_name=secret_name)
+
+    async def list_secrets(self, secret_name=None):
+        names = await run_in_thread(
+            lambda: tuple(self.keychain.list_secrets(secret_name=secret_name)))
+        for name in names:
+            yield name
+
+    async def get_many(self, keys, secret_name=None, concurrency=None):
+        """ Return a dict with the secret of each key, reading at most `concurrency` secrets at the same time. """
+        keys = tuple(keys)
+        secrets = await wait_all(
+            (self.get_secret(key, secret_name=secret_name) for key in keys),
+            concurrency=concurrency or self.concurrency)
+        return dict(zip(keys, secrets))
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from rpy.cli.dispatch import DispatchCommand
+from rpy.cli.manifest import CommandManifest
+
+
+class TestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.manifest = CommandManifest(
+            DispatchCommand.modules,
+            DispatchCommand.class_name,
+            path=os.path.join(self.folder, 'commands.json'))
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_manifest(self):
+
+        commands = self.manifest.commands()
+
+        self.assertEqual(commands['pass'], 'rpy.cli.commands.pass.Command')
+        self.assertTrue(self.manifest.is_valid(self.manifest.read()))
+
+        self.manifest.register('deploy', 'project.deploy.Command')
+
+        self.assertEqual(self.manifest.commands()['deploy'], 'project.deploy.Command')
+
+        #a stale folder forces a rebuild, which keeps registered commands
+        stale = self.manifest.read()
+        for folder in stale['folders']:
+            stale['folders'][folder] -= 1
+        self.manifest.write(stale)
+
+        self.assertFalse(self.manifest.is_valid(self.manifest.read()))
+        self.assertEqual(self.manifest.commands()['deploy'], 'project.deploy.Command')
+        self.assertTrue(self.manifest.is_valid(self.manifest.read()))
+
+        #a manifest written by another copy of the package is rebuilt
+        other = self.manifest.read()
+        other['modules'] = [os.path.join(self.folder, 'rpy', 'cli', 'commands')]
+        self.manifest.write(other)
+
+        self.assertFalse(self.manifest.is_valid(self.manifest.read()))
+        self.assertEqual(self.manifest.commands()['deploy'], 'project.deploy.Command')
+        self.assertTrue(self.manifest.is_valid(self.manifest.read()))
+
+        self.manifest.unregister('deploy')
+
+        self.assertNotIn('deploy', self.manifest.commands())
+
+        for content in ('{broken', '[]', '"commands"', '1'):
+            with open(self.manifest.path, 'w') as stream:
+                stream.write(content)
+
+            self.assertEqual(self.manifest.commands(), commands)
+
+        with open(self.manifest.path, 'r') as stream:
+            self.assertEqual(json.load(stream)['commands'], commands)
+
+    def test_startup_budget(self):
+
+        #modules that must only be imported by the commands using them
+        heavy = ('argparse', 'asyncio', 'cryptography', 'hashlib', 'hmac', 'importlib.metadata',
+                 'inspect', 'pickle', 'sqlite3', 'subprocess', 'tempfile')
+
+        output = subprocess.check_output([sys.executable, '-c', '; '.join((
+            'import json, sys, time',
+            'before = set(sys.modules)',
+            't = time.perf_counter()',
+            'import rpy.cli.dispatch',
+            'print(json.dumps([time.perf_counter() - t, sorted(set(sys.modules) - before)]))',
+        ))])
+        elapsed, modules = json.loads(output.decode('utf-8'))
+
+        self.assertEqual([module for module in heavy if module in modules], [])
+        self.assertLessEqual(len(modules), 60)
+        self.assertLess(elapsed, 0.5)
+
+    def test_startup_profile(self):
+
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'rpy', '--startup-profile'],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env=dict(os.environ, RPY_COMMANDS_MANIFEST=self.manifest.path))
+        stdout, stderr = process.communicate()
+
+        self.assertEqual(process.returncode, 1)
+        self.assertIn(b'pass', stdout)
+        self.assertIn(b'discovery', stderr)
+        self.assertIn(b'rpy.cli.manifest', stderr)
+
+    def test_profile(self):
+
+        output = os.path.join(self.folder, 'profile')
+
+        process = subprocess.run(
+            [sys.executable, '-m', 'rpy', 'profile', '--limit', '10', '--output', output,
+             'benchmark', 'encoding.force_text_columns', '--repeat', '1'],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True,
+            env=dict(os.environ, RPY_COMMANDS_MANIFEST=self.manifest.path))
+
+        report = process.stderr.decode('utf-8')
+        cpu, memory = report.split('Memory profile, peak')
+
+        self.assertIn(b'encoding.force_text_columns columns', process.stdout)
+        self.assertIn('Profiled benchmark encoding.force_text_columns', cpu)
+        self.assertIn('Ordered by: cumulative time', cpu)
+        self.assertIn('benchmark.py', cpu)
+        #the rows of the benchmark are freed at exit, they are found in the sample closest to the peak
+        self.assertIn(os.path.join('rpy', 'benchmarks', 'encoding.py'), memory)
+        self.assertTrue(os.path.exists('%s.pstats' % output))
+        self.assertTrue(os.path.exists('%s.tracemalloc' % output))
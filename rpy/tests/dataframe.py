@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import asyncio
+import csv
+import io
+import unittest
+
+from rpy.dataframe.csv import aget_csv_dicts, aget_csv_rows, iter_csv_rows
+from rpy.functions.encoding import iter_chunks
+
+
+class Source(io.BytesIO):
+
+    def __init__(self, *args):
+        super(Source, self).__init__(*args)
+        self.reads = 0
+
+    def read(self, size=-1):
+        self.reads += 1
+        return super(Source, self).read(size)
+
+
+class TestCase(unittest.TestCase):
+
+    def run_async(self, coroutine):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coroutine)
+        finally:
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.close()
+
+    def test_async_csv(self):
+
+        rows = [['name', 'value']] + [
+            ['quoted "%s"' % i, 'multi\nline, %s\r\nè' % i] for i in range(500)
+        ]
+        stream = io.StringIO(newline='')
+        csv.writer(stream).writerows(rows)
+        payload = stream.getvalue().encode('utf-8')
+
+        async def run():
+            results = []
+            for chunk_size in (7, 1024 * 1024):
+                results.append([row async for row in aget_csv_rows(Source(payload), chunk_size=chunk_size)])
+
+            reader = asyncio.StreamReader()
+            reader.feed_data(payload)
+            reader.feed_eof()
+            results.append([
+                row async for batch in aget_csv_rows(reader, chunk_size=100, batch=True) for row in batch
+            ])
+
+            dicts = [d async for d in aget_csv_dicts(Source(payload), header_processor=str.upper, chunk_size=64)]
+
+            source = Source(payload)
+            lazy = aget_csv_rows(source, chunk_size=10, max_pending=2)
+            await lazy.__anext__()
+            await asyncio.sleep(0.05)
+            reads = source.reads
+            await lazy.aclose()
+            return results, dicts, reads
+
+        results, dicts, reads = self.run_async(run())
+
+        for result in results:
+            self.assertEqual(result, rows)
+
+        self.assertEqual(len(dicts), 500)
+        self.assertEqual(dicts[1].NAME, 'quoted "1"')
+
+        #the reader waits for the consumer instead of reading the whole source
+        self.assertLess(reads, 10)
+
+        #an escaped escapechar before a closing quote does not escape the quote
+        rows = [['a,\\', 'x\ny'], ['b\\"', 'z\\\n']] * 50
+        stream = io.StringIO(newline='')
+        csv.writer(stream, escapechar='\\', doublequote=False).writerows(rows)
+        payload = stream.getvalue().encode('utf-8')
+
+        for chunk_size in (1, 3, 1000):
+            self.assertEqual(self.run_async(self.collect(aget_csv_rows(
+                Source(payload), chunk_size=chunk_size, escapechar='\\', doublequote=False))), rows)
+
+    def test_chunked_csv(self):
+
+        rows = [['quoted "%s"' % i, 'multi\nline\r\n\u20ac'] for i in range(100)]
+        stream = io.StringIO(newline='')
+        csv.writer(stream).writerows(rows)
+
+        for encoding in ('utf-8-sig', 'utf-16'):
+            payload = stream.getvalue().encode(encoding)
+
+            for chunk_size in (1, 5, 1024):
+                self.assertEqual(list(iter_csv_rows(iter_chunks(io.BytesIO(payload), chunk_size))), rows)
+
+            self.assertEqual(
+                self.run_async(self.collect(aget_csv_rows(Source(payload), chunk_size=3))), rows)
+
+    async def collect(self, iterable):
+        return [item async for item in iterable]
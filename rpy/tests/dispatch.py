@@ -0,0 +1,343 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import gc
+import tracemalloc
+import unittest
+from collections import OrderedDict
+
+from rpy.functions.dispatch import Dispatch
+
+
+class TestCase(unittest.TestCase):
+
+    def test_single_dispatch(self):
+
+        dispatch = Dispatch()
+
+        @dispatch.dispatch(dict)
+        def handle(value):
+            return 'dict'
+
+        @dispatch.dispatch((int, float))
+        def handle(value):
+            return 'number'
+
+        self.assertEqual(dispatch(OrderedDict()), 'dict')
+        self.assertEqual(dispatch(2), 'number')
+        self.assertEqual(dispatch(2.5), 'number')
+        self.assertEqual(dispatch(True), 'number')
+
+        with self.assertRaises(ValueError):
+            dispatch('foo')
+
+        with self.assertRaises(TypeError):
+            dispatch.register(handle, int)
+
+    def test_multiple_dispatch(self):
+
+        dispatch = Dispatch(nargs = 2)
+
+        @dispatch.dispatch(int, int)
+        def handle(a, b):
+            return 'int-int'
+
+        @dispatch.dispatch(int)
+        def handle(a, b):
+            return 'int-object'
+
+        @dispatch.dispatch(str, (int, float))
+        def handle(a, b):
+            return 'str-number'
+
+        @dispatch.dispatch()
+        def handle(a, b):
+            return 'object-object'
+
+        self.assertEqual(dispatch(1, 2), 'int-int')
+        self.assertEqual(dispatch(True, 2), 'int-int')
+        self.assertEqual(dispatch(1, 'a'), 'int-object')
+        self.assertEqual(dispatch('a', 2.0), 'str-number')
+        self.assertEqual(dispatch('a', 'b'), 'object-object')
+
+        self.assertEqual(dispatch.dispatch_dict_cache.lookup((bool, int))(1, 2), 'int-int')
+
+    def test_ambiguous_registration(self):
+
+        dispatch = Dispatch(nargs = 2)
+        dispatch.register(lambda a, b: 'int-object', (int, object))
+
+        with self.assertRaises(TypeError):
+            dispatch.register(lambda a, b: 'object-int', (object, int))
+
+        self.assertEqual(len(dispatch.dispatch_dict), 1)
+
+        dispatch.register(lambda a, b: 'int-int', (int, int))
+        dispatch.register(lambda a, b: 'object-int', (object, int))
+
+        self.assertEqual(dispatch(1, 1), 'int-int')
+        self.assertEqual(dispatch('a', 1), 'object-int')
+
+    def test_as_method(self):
+
+        dispatch = Dispatch(nargs = 2)
+
+        @dispatch.dispatch(str, int)
+        def handle(self, a, b):
+            return self.prefix + a * b
+
+        class Repeat(object):
+            prefix = '>'
+            repeat = dispatch.as_method()
+
+        self.assertEqual(Repeat().repeat('a', 3), '>aaa')
+
+    def test_resolve_override(self):
+
+        class Upper(Dispatch):
+
+            def resolve(self, *args):
+                impl = super(Upper, self).resolve(*args)
+                return lambda *args: impl(*args).upper()
+
+        dispatch = Upper()
+        dispatch.register(lambda value: 'object', object)
+
+        for i in range(2):
+            self.assertEqual(dispatch(1), 'OBJECT')
+            self.assertEqual(dispatch.resolve(1)(1), 'OBJECT')
+
+        dispatch.enable_stats()
+
+        self.assertEqual(dispatch(1), 'OBJECT')
+
+        dispatch.disable_stats()
+
+        self.assertEqual(dispatch(1), 'OBJECT')
+
+    def test_resolve_single_argument_override(self):
+
+        class Tagged(Dispatch):
+
+            def resolve(self, arg):
+                impl = super(Tagged, self).resolve(arg)
+                return lambda *args: ('tagged', impl(*args))
+
+        dispatch = Tagged()
+        dispatch.register(lambda value, y: value + y, int)
+
+        for i in range(2):
+            self.assertEqual(dispatch(1, 2), ('tagged', 3))
+        self.assertEqual(dispatch.map([1, 2], 1), (('tagged', 2), ('tagged', 3)))
+
+        method = Tagged()
+        method.register(lambda self, value, y: self.offset + value + y, int)
+
+        class Row(object):
+            offset = 10
+            write = method.as_method()
+
+        self.assertEqual(Row().write(1, 2), ('tagged', 13))
+
+        dispatch.enable_stats()
+
+        self.assertEqual(dispatch(1, 2), ('tagged', 3))
+
+    def test_freeze(self):
+
+        dispatch = Dispatch()
+        dispatch.register(lambda value: 'number', (int, float))
+        dispatch.register(lambda value: 'object', object)
+
+        dispatch('foo')
+        dispatch.freeze(bool)
+
+        self.assertEqual(
+            set(dispatch.dispatch_dict_cache.iter_types()),
+            {int, float, object, str, bool}
+        )
+        self.assertEqual(dispatch(True), 'number')
+
+        dispatch.register(lambda value: 'bool', bool)
+
+        self.assertTrue(dispatch.frozen)
+        self.assertIn(str, tuple(dispatch.dispatch_dict_cache.iter_types()))
+        self.assertEqual(dispatch(True), 'bool')
+
+        dispatch.unregister(bool)
+
+        self.assertEqual(dispatch(True), 'number')
+
+        dispatch.unfreeze()
+
+        self.assertEqual(len(dispatch.dispatch_dict_cache), 0)
+
+    def test_freeze_maxsize(self):
+
+        dispatch = Dispatch(maxsize = 2)
+        dispatch.register(lambda value: 'number', (int, float, complex))
+
+        dispatch.freeze(bool)
+
+        for value in ('a', b'a', None):
+            with self.assertRaises(ValueError):
+                dispatch(value)
+
+        self.assertEqual(len(dispatch.dispatch_dict_cache), 6)
+        self.assertEqual(dispatch.cache_info().evictions, 1)
+
+        for cls in (int, float, complex, bool):
+            self.assertIsNotNone(dispatch.dispatch_dict_cache.lookup(cls))
+
+    def test_stats(self):
+
+        dispatch = Dispatch()
+        dispatch.register(lambda value: 'number', (int, float))
+
+        dispatch.enable_stats()
+
+        for value in (1, 2, True, 'foo'):
+            try:
+                dispatch(value)
+            except ValueError:
+                pass
+
+        stats = dispatch.stats()
+
+        self.assertEqual(stats[int].calls, 2)
+        self.assertEqual(stats[int].hits, 1)
+        self.assertEqual(stats[int].misses, 1)
+        self.assertEqual(stats[int].mro_depth, 1)
+        self.assertEqual(stats[bool].mro_depth, 2)
+        self.assertEqual(stats[str].defaults, 1)
+        self.assertIn('bool', dispatch.stats_report())
+
+        dispatch.disable_stats()
+
+        self.assertIs(dispatch.__class__, Dispatch)
+
+        dispatch(1)
+
+        self.assertEqual(dispatch.stats()[int].calls, 2)
+
+    def test_map(self):
+
+        dispatch = Dispatch()
+        batches = []
+
+        @dispatch.dispatch(object)
+        def handle(value, suffix):
+            return '%s%s' % (value, suffix)
+
+        @dispatch.dispatch(bool)
+        def handle(value, suffix):
+            return 'bool'
+
+        @dispatch.dispatch_batch(int)
+        def handle(values, suffix):
+            batches.append(values)
+            return [value * 2 for value in values]
+
+        self.assertEqual(
+            dispatch.map([1, 'a', 2, True, 3, 'b'], '!'),
+            (2, 'a!', 4, 'bool', 6, 'b!')
+        )
+        self.assertEqual(batches, [[1, 2, 3]])
+        self.assertEqual(dispatch.map(()), ())
+
+        dispatch.register_batch(lambda values, suffix: (), str)
+
+        with self.assertRaises(ValueError):
+            dispatch.map(['a'], '!')
+
+    def test_map_stats(self):
+
+        def counts(dispatch):
+            return {
+                key: (record.calls, record.hits, record.misses, record.defaults)
+                for key, record in dispatch.stats().items()
+            }
+
+        def dispatcher():
+            dispatch = Dispatch()
+            dispatch.register(lambda value: value, (int, str))
+            dispatch.register_batch(lambda values: values, int)
+            dispatch.enable_stats()
+            return dispatch
+
+        items = [1, 2, 3, 'a', 'b', 2.5]
+
+        mapped, called = dispatcher(), dispatcher()
+
+        with self.assertRaises(ValueError):
+            mapped.map(items)
+        mapped.map(items[:5])
+
+        for item in items:
+            try:
+                called(item)
+            except ValueError:
+                pass
+        for item in items[:5]:
+            called(item)
+
+        self.assertEqual(counts(mapped), counts(called))
+        self.assertEqual(counts(mapped)[int], (6, 5, 1, 0))
+
+    def test_cache_does_not_keep_classes_alive(self):
+        self._check_classes_collected(stats=False)
+
+    def test_stats_do_not_keep_classes_alive(self):
+        self._check_classes_collected(stats=True)
+
+    def _check_classes_collected(self, stats):
+
+        dispatch = Dispatch()
+        dispatch.register(lambda value: value, tuple)
+
+        if stats:
+            dispatch.enable_stats()
+            dispatch((1, 2))
+
+        def churn(n):
+            for i in range(n):
+                row = type(str('Row'), (tuple, ), {})
+                dispatch(row((1, 2)))
+
+        churn(500)
+        gc.collect()
+
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            churn(5000)
+            gc.collect()
+            after = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+
+        self.assertLess(after - before, 64 * 1024)
+        self.assertEqual(len(dispatch.dispatch_dict_cache.refs), stats and 1 or 0)
+        self.assertEqual(dispatch.cache_info().size, stats and 1 or 0)
+        self.assertEqual(dispatch.cache_info().collections, 5500)
+
+        if stats:
+            self.assertEqual(list(dispatch.stats()), [tuple])
+
+    def test_cache_maxsize(self):
+
+        dispatch = Dispatch(maxsize = 2)
+        dispatch.register(lambda value: 'object', object)
+
+        for value in (1, 'a', 2.5, None, 1):
+            self.assertEqual(dispatch(value), 'object')
+
+        info = dispatch.cache_info()
+
+        self.assertEqual(info.size, 2)
+        self.assertEqual(info.evictions, 3)
+        self.assertEqual(
+            set(dispatch.dispatch_dict_cache.iter_types()),
+            {type(None), int}
+        )
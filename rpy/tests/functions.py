@@ -2,9 +2,39 @@
 
 from __future__ import absolute_import, print_function, unicode_literals
 
+import asyncio
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
 import unittest
+from array import array
+from functools import partial
 
-from rpy.functions.functional import composition, delete_duplicates
+from rpy.functions.asyncio import (as_completed_all, get_executor,
+                                    run_in_process, run_in_thread,
+                                    shutdown_executors, wait_all)
+from rpy.functions.debug import TimingRegistry
+from rpy.functions.decorators import memoize, to_tuple
+from rpy.functions.datastructures import BloomFilter, SpillSet
+from rpy.functions.diskcache import DiskCache, code_hash, disk_memoize
+from rpy.functions.encoding import (force_bytes_joined, force_bytes_many,
+                                    force_text_columns, force_text_many,
+                                    iter_decode, iter_encode)
+from rpy.functions.functional import (composition, delete_duplicates, flatten,
+                                      iter_delete_duplicates, iterate,
+                                      partition)
+from rpy.functions.importutils import API
+from rpy.functions.parallel import pimap, pmap, tmap
+from rpy.functions.process import ProcessPool, run_processes
+from rpy.functions.require import missing_requirements, path_key
+from rpy.functions.stream import Stream
 
 
 class TestCase(unittest.TestCase):
@@ -23,6 +53,28 @@ class TestCase(unittest.TestCase):
             9
         )
 
+        add = composition(lambda s: s+2, lambda s: s*3)
+        nested = composition(add, add, str)
+
+        self.assertEqual(nested(1), '33')
+        self.assertEqual(len(nested.functions), 5)
+
+    def test_composition_wraps(self):
+
+        @to_tuple
+        def numbers(n):
+            """ Yield numbers """
+            yield from range(n)
+
+        class Numbers(object):
+            numbers = to_tuple(lambda self, n: range(n))
+
+        self.assertEqual(numbers(3), (0, 1, 2))
+        self.assertEqual(numbers.__name__, 'numbers')
+        self.assertEqual(numbers.__doc__, ' Yield numbers ')
+        self.assertEqual(numbers.__wrapped__(2).__class__.__name__, 'generator')
+        self.assertEqual(Numbers().numbers(2), (0, 1))
+
     def test_delete_duplicates(self):
 
         self.assertEqual(
@@ -55,4 +107,671 @@ class TestCase(unittest.TestCase):
                 {'price': 20, 'mode': 'tomorrow'}, 
                 {'price': 30, 'mode': 'asap'},
             )
-        )
\ No newline at end of file
+        )
+
+    def test_flatten(self):
+
+        self.assertEqual(
+            tuple(flatten(1, [2, (3, [4, 'ab'])], iter([5]), int)),
+            (1, 2, 3, 4, 'ab', 5, int)
+        )
+        self.assertEqual(
+            tuple(flatten([1, [2, [3]]], max_depth=2)),
+            (1, 2, [3])
+        )
+        self.assertEqual(
+            tuple(flatten([1, [2, [3]]], 'a', max_depth=1)),
+            tuple(iterate([1, [2, [3]]], 'a'))
+        )
+
+        value = 1
+        for i in range(5000):
+            value = [value]
+
+        self.assertEqual(tuple(flatten(value)), (1, ))
+
+    def test_partition(self):
+
+        for value in ([1, 2, 3, 4, 5], (1, 2, 3, 4, 5), iter(range(1, 6))):
+            self.assertEqual(
+                tuple(partition(value, 2)),
+                ((1, 2), (3, 4), (5, ))
+            )
+
+        for value in ([1, 2, 3, 4, 5], (1, 2, 3, 4, 5), iter(range(1, 6))):
+            self.assertEqual(
+                tuple(map(tuple, partition(value, 2, copy=False))),
+                ((1, 2), (3, 4), (5, ))
+            )
+
+        buffer = bytearray(b'abcde')
+        chunks = tuple(partition(buffer, 2, copy=False))
+
+        self.assertIsInstance(chunks[0], memoryview)
+        buffer[0:1] = b'z'
+        self.assertEqual(tuple(map(bytes, chunks)), (b'zb', b'cd', b'e'))
+
+        self.assertEqual(
+            tuple(chunk.tolist() for chunk in partition(array('i', range(5)), 2, copy=False)),
+            ([0, 1], [2, 3], [4])
+        )
+
+        for n in (0, -1):
+            for copy in (True, False):
+                with self.assertRaises(ValueError):
+                    tuple(partition([1, 2, 3], n, copy=copy))
+
+    def test_iter_delete_duplicates(self):
+
+        consumed = []
+
+        def numbers():
+            for i in (1, 2, 1, 3, 2):
+                consumed.append(i)
+                yield i
+
+        stream = iter_delete_duplicates(numbers())
+
+        self.assertEqual(next(stream), 1)
+        self.assertEqual(consumed, [1])
+        self.assertEqual(tuple(stream), (2, 3))
+
+        with SpillSet(threshold=2) as seen:
+            self.assertEqual(
+                tuple(iter_delete_duplicates(('a', 'b', 'a', 'c', 'b', 'd', 'c'), seen=seen)),
+                ('a', 'b', 'c', 'd')
+            )
+            self.assertIsNotNone(seen.connection)
+            self.assertEqual(len(seen), 4)
+            path = seen.path
+
+        self.assertFalse(os.path.exists(path))
+
+        class AddOnly(SpillSet):
+            def __contains__(self, key):
+                raise AssertionError('the result of add is used')
+
+        with AddOnly(threshold=2) as seen:
+            self.assertEqual(
+                tuple(iter_delete_duplicates(('a', 'b', 'a', 'c', 'b'), seen=seen)),
+                ('a', 'b', 'c')
+            )
+            self.assertEqual((seen.add('d'), seen.add('d'), seen.add('a')), (True, False, False))
+
+        folder = tempfile.mkdtemp()
+        try:
+            path = os.path.join(folder, 'seen.sqlite')
+
+            with SpillSet(threshold=2, path=path, batch_size=2) as seen:
+                for key in (1, 'a', 'b', True, 1.0, (2, 'c'), (2.0, 'c'), 'd', 'e'):
+                    seen.add(key)
+                self.assertEqual(len(seen), 6)
+                self.assertIn(True, seen)
+
+            #an explicit path is kept, with all the keys committed
+            connection = sqlite3.connect(path)
+            try:
+                self.assertEqual(connection.execute('SELECT COUNT(*) FROM keys').fetchone(), (6, ))
+            finally:
+                connection.close()
+
+            #a second run on the same path does not see the keys of the first one
+            with SpillSet(threshold=2, path=path) as seen:
+                self.assertEqual(
+                    tuple(iter_delete_duplicates('abcdefgh', seen=seen)), tuple('abcdefgh'))
+                self.assertEqual(len(seen), 8)
+        finally:
+            shutil.rmtree(folder)
+
+        seen = BloomFilter(capacity=1000, error_rate=0.01)
+        values = tuple(range(1000))
+
+        result = tuple(iter_delete_duplicates(values + values, seen=seen))
+
+        self.assertEqual(len(set(result)), len(result))
+        self.assertEqual(result, tuple(sorted(result)))
+        self.assertGreater(len(result), 950)
+        self.assertTrue(all(value in seen for value in values))
+        self.assertLess(sum(value in seen for value in range(1000, 11000)), 300)
+        self.assertFalse(seen.add(0))
+
+    def test_stream(self):
+
+        stream = Stream(range(20)).map(lambda i: i * 3).filter(lambda i: i % 2).map(lambda i: i % 7)
+
+        self.assertEqual(len(tuple(stream.blocks())), 1)
+        self.assertEqual(
+            stream.dedupe().chunk(2).collect(),
+            ((3, 2), (1, 0), (6, 5), (4, ))
+        )
+        self.assertEqual(stream.collect(list)[:3], [3, 2, 1])
+
+        #fused stages show up in tracebacks
+        try:
+            Stream([1, 0]).map(lambda i: 1 / i).filter(bool).collect()
+        except ZeroDivisionError:
+            self.assertIn('value = f0(value)', traceback.format_exc())
+        else:
+            self.fail('ZeroDivisionError not raised')
+
+        consumed = []
+
+        def source():
+            for i in range(100):
+                consumed.append(i)
+                yield i
+
+        self.assertEqual(Stream(source()).filter(lambda i: i > 2).first(), 3)
+        self.assertEqual(consumed, [0, 1, 2, 3])
+
+        stream = Stream(range(10), profile=True).filter(lambda i: i % 2).take(3)
+
+        self.assertEqual(stream.collect(), (1, 3, 5))
+        self.assertEqual(
+            tuple((record.stage, record.items_in, record.items_out) for record in stream.stats()),
+            (('filter', 6, 3), ('take', 3, 3))
+        )
+
+    def test_parallel_map(self):
+
+        values = tuple(range(-500, 500))
+
+        self.assertEqual(pmap(abs, values, workers=2), tuple(map(abs, values)))
+        self.assertEqual(pmap(abs, values, workers=2, chunksize=7), tuple(map(abs, values)))
+        self.assertEqual(
+            sorted(pmap(abs, values, workers=2, ordered=False)),
+            sorted(map(abs, values))
+        )
+        self.assertEqual(tmap(abs, values, workers=4), tuple(map(abs, values)))
+
+        payload = bytes(bytearray(range(256))) * 64
+
+        self.assertEqual(
+            pmap(len, (payload, array('d', range(1000)), 'abc'), workers=2, shared_memory_threshold=1024),
+            (len(payload), 1000, 3)
+        )
+        self.assertEqual(
+            pmap(sum, (payload, array('d', range(1000))), workers=2, shared_memory_threshold=1024),
+            (sum(payload), sum(range(1000)))
+        )
+
+        #without a threshold large items are pickled, functions receive the original type
+        self.assertEqual(pmap(bytes.upper, (b'a' * 2 ** 21, b'b'), workers=2), (b'A' * 2 ** 21, b'B'))
+
+        consumed = []
+
+        def source():
+            for i in range(10000):
+                consumed.append(i)
+                yield i
+
+        results = pimap(abs, source(), workers=2, chunksize=10, max_pending=2, thread=True)
+
+        self.assertEqual(next(results), 0)
+        self.assertLessEqual(len(consumed), 40)
+
+        results.close()
+
+    def test_memoize(self):
+
+        calls = []
+
+        @memoize(maxsize=2)
+        def total(values, scale=1):
+            calls.append(values)
+            return sum(values['numbers']) * scale
+
+        self.assertEqual(total({'numbers': [1, 2]}), 3)
+        self.assertEqual(total({'numbers': [1, 2]}), 3)
+        self.assertEqual(total({'numbers': [1, 2]}, scale=2), 6)
+        self.assertEqual(total({'numbers': [3]}), 3)
+        self.assertEqual(total({'numbers': [1, 2]}), 3)
+        self.assertEqual(len(calls), 4)
+
+        info = total.cache_info()
+
+        self.assertEqual((info.hits, info.misses, info.evictions, info.size), (1, 4, 2, 2))
+
+        total.cache_clear()
+        info = total.cache_info()
+
+        self.assertEqual((info.hits, info.misses, info.evictions, info.size), (0, 0, 0, 0))
+
+        @memoize(ttl=0.01)
+        def now():
+            return time.monotonic()
+
+        value = now()
+
+        self.assertEqual(now(), value)
+        time.sleep(0.02)
+        self.assertNotEqual(now(), value)
+        self.assertEqual(now.cache_info().expirations, 1)
+
+        @memoize(maxbytes=100, sizeof=len)
+        def text(n):
+            return 'x' * n
+
+        text(60)
+        text(30)
+        text(50)
+        text(200)
+
+        self.assertEqual(text.cache_info().bytes, 80)
+
+    def test_memoize_coroutine(self):
+
+        calls = []
+
+        @memoize
+        async def fetch(key):
+            calls.append(key)
+            await asyncio.sleep(0.01)
+            return key * 2
+
+        async def run():
+            first = await asyncio.gather(fetch(1), fetch(1), fetch(2))
+            return first, await fetch(1)
+
+        async def cancel_first():
+            #cancelling the first caller does not cancel the call awaited by the second
+            cancelled, waiting = asyncio.ensure_future(fetch(3)), asyncio.ensure_future(fetch(3))
+            await asyncio.sleep(0)
+            cancelled.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await cancelled
+            return await waiting
+
+        loop = asyncio.new_event_loop()
+        try:
+            self.assertEqual(loop.run_until_complete(run()), ([2, 2, 4], 2))
+            self.assertEqual(loop.run_until_complete(cancel_first()), 6)
+        finally:
+            loop.close()
+
+        self.assertEqual(calls, [1, 2, 3])
+
+    def test_disk_memoize(self):
+
+        folder = tempfile.mkdtemp()
+        path = os.path.join(folder, 'cache.sqlite')
+        calls = []
+
+        def expensive(values, scale=1):
+            calls.append(values)
+            return [sum(values['numbers']) * scale]
+
+        try:
+            cached = disk_memoize(expensive, path=path, memory=10)
+
+            self.assertEqual(cached({'numbers': {1, 2}}), [3])
+            self.assertEqual(cached({'numbers': {2, 1}}), [3])
+            self.assertEqual(cached({'numbers': {1, 2}}, scale=2), [6])
+            self.assertEqual(len(calls), 2)
+
+            #a new process would only find the entries on disk, calls changed but it's not part of the hash
+            restarted = disk_memoize(expensive, path=path)
+
+            self.assertEqual(restarted({'numbers': {1, 2}}), [3])
+            self.assertEqual(len(calls), 2)
+
+            info = restarted.cache_info()
+
+            self.assertEqual((info.hits, info.misses, info.size), (1, 0, 2))
+
+            restarted.cache_clear()
+
+            self.assertEqual(restarted.cache_info().size, 0)
+            self.assertEqual(restarted.cache_info().hits, 0)
+
+            #positional arguments looking like arguments and options are a different call
+            echo = disk_memoize(lambda *args, **opts: (args, opts), path=path)
+
+            self.assertEqual(echo(1, a=1), ((1, ), {'a': 1}))
+            self.assertEqual(echo((1, ), {'a': 1}), (((1, ), {'a': 1}), {}))
+
+            echo.cache.close()
+
+            small = disk_memoize(expensive, path=path, maxbytes=100)
+            for i in range(20):
+                small({'numbers': [i]})
+
+            self.assertLessEqual(small.cache_info().bytes, 100)
+            self.assertGreater(small.cache_info().size, 0)
+
+            cached.cache.close()
+            restarted.cache.close()
+            small.cache.close()
+
+            #the total size is kept by triggers, reads only update the access time after touch_interval
+            totals = DiskCache(path=os.path.join(folder, 'totals.sqlite'), maxbytes=None)
+            totals.set('a', 'x' * 100)
+            totals.set('a', 'x' * 10)
+            totals.set('b', 'y')
+            connection = totals.connect()
+
+            self.assertEqual(
+                totals.total(connection), connection.execute('SELECT SUM(size) FROM entries').fetchone()[0])
+
+            accessed = connection.execute('SELECT accessed FROM entries WHERE key = ?', ('b', )).fetchone()
+            self.assertEqual(totals.get('b'), 'y')
+            self.assertEqual(
+                connection.execute('SELECT accessed FROM entries WHERE key = ?', ('b', )).fetchone(), accessed)
+
+            totals.clear()
+            self.assertEqual(totals.info().bytes, 0)
+            totals.close()
+
+            #the default cache is private, even when the cache folder was created with the default mode
+            os.makedirs(os.path.join(folder, 'home', 'rpy'), mode=0o755)
+            environ = dict(os.environ)
+            os.environ['XDG_CACHE_HOME'] = os.path.join(folder, 'home')
+            try:
+                private = DiskCache()
+                private.set('key', 'value')
+                private.close()
+            finally:
+                os.environ.clear()
+                os.environ.update(environ)
+
+            if not os.name == 'nt':
+                self.assertEqual(os.stat(os.path.dirname(private.path)).st_mode & 0o777, 0o700)
+                self.assertEqual(os.stat(private.path).st_mode & 0o777, 0o600)
+                self.assertEqual(os.stat(path).st_mode & 0o077, 0)
+
+            def scaled(scale):
+                return lambda x: x * scale
+
+            #defaults and values in the closure are part of the hash, mutable state is not
+            self.assertNotEqual(code_hash(lambda x, scale=2: x * scale), code_hash(lambda x, scale=3: x * scale))
+            self.assertNotEqual(code_hash(lambda x, *, scale=2: x * scale), code_hash(lambda x, *, scale=3: x * scale))
+            self.assertNotEqual(code_hash(scaled(2)), code_hash(scaled(3)))
+            self.assertEqual(code_hash(scaled(2)), code_hash(scaled(2)))
+
+            class Scale(object):
+                def __call__(self, x, scale=1):
+                    return x * scale
+
+            #callables that are not plain functions
+            for function in (partial(expensive, scale=3), Scale(), Scale().__call__, len):
+                disk_memoize(function, path=path).cache.close()
+
+            self.assertNotEqual(
+                code_hash(partial(expensive, scale=2)), code_hash(partial(expensive, scale=3)))
+            tripled = disk_memoize(partial(expensive, scale=3), path=path)
+
+            self.assertEqual(tripled({'numbers': [1]}), [3])
+
+            tripled.cache.close()
+
+            with self.assertRaises(TypeError):
+                disk_memoize(object(), path=path)
+        finally:
+            shutil.rmtree(folder)
+
+    def test_api(self):
+
+        api = API(dumps=('rpy.missing.dumps', 'json.dumps'), loads='json.loads')
+
+        self.assertEqual(api.dumps([1]), '[1]')
+        self.assertEqual(api.stats()[0].path, 'json.dumps')
+
+        futures = api.preload()
+
+        self.assertEqual(futures['loads'].result()('[1]'), [1])
+        self.assertEqual(set(record.name for record in api.stats()), {'dumps', 'loads'})
+
+        calls = []
+
+        def importer(path):
+            calls.append(path)
+            time.sleep(0.05)
+            return path
+
+        slow = API(importer=importer, name='slow.name')
+        threads = [threading.Thread(target=getattr, args=(slow, 'name')) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(calls, ['slow.name'])
+
+    def test_missing_requirements(self):
+
+        folder = tempfile.mkdtemp()
+        path = os.path.join(folder, 'requirements.json')
+
+        try:
+            self.assertEqual(
+                tuple(missing_requirements('pip', ('pip', '0.0.1'), 'rpy-missing-distribution', cache=path)),
+                ('pip==0.0.1', 'rpy-missing-distribution'))
+
+            with open(path, 'r') as stream:
+                self.assertEqual(json.load(stream)['satisfied'], ['pip'])
+
+            self.assertEqual(tuple(missing_requirements('pip', cache=path)), ())
+
+            #the working directory is not part of the key, sys.path starts with '' with python -c
+            entries, cwd = list(sys.path), os.getcwd()
+            sys.path[0:1] = ['']
+            try:
+                key = path_key()
+                os.chdir(folder)
+                self.assertEqual(path_key(), key)
+            finally:
+                os.chdir(cwd)
+                sys.path[:] = entries
+        finally:
+            shutil.rmtree(folder)
+
+    def test_wait_all(self):
+
+        running = []
+        peak = []
+
+        async def job(value, delay=0.01):
+            running.append(value)
+            peak.append(len(running))
+            try:
+                await asyncio.sleep(delay)
+                if value is None:
+                    raise ValueError('failed')
+                return value
+            finally:
+                running.remove(value)
+
+        async def run():
+            results = await wait_all((job(i) for i in range(100)), concurrency=5)
+            completed = [
+                pair async for pair in as_completed_all(
+                    [job(1, 0.05), job(2), job(3, 1)], timeout=0.1, errors='return')
+            ]
+            with self.assertRaises(ValueError):
+                await wait_all([job(4, 1), job(None)])
+            return results, completed
+
+        loop = asyncio.new_event_loop()
+        try:
+            results, completed = loop.run_until_complete(run())
+        finally:
+            loop.close()
+
+        self.assertEqual(results, list(range(100)))
+        self.assertEqual(max(peak[:100]), 5)
+        self.assertEqual([pair[0] for pair in completed], [1, 0, 2])
+        self.assertIsInstance(completed[2][1], asyncio.TimeoutError)
+        self.assertEqual(running, [])
+
+    def test_executors(self):
+
+        async def run():
+            thread = await run_in_thread(threading.current_thread)
+            pid = await run_in_process(os.getpid)
+            executor = get_executor()
+            await shutdown_executors()
+            return thread, pid, executor
+
+        loop = asyncio.new_event_loop()
+        try:
+            thread, pid, executor = loop.run_until_complete(run())
+        finally:
+            loop.close()
+
+        self.assertTrue(thread.name.startswith('rpy-asyncio'))
+        self.assertNotEqual(pid, os.getpid())
+        self.assertTrue(executor._shutdown)
+
+        #closing the loop shuts down both pools without calling shutdown_executors
+        loop = asyncio.new_event_loop()
+        try:
+            pid = loop.run_until_complete(run_in_process(os.getpid))
+            thread, process = get_executor(loop), get_executor(loop, process=True)
+        finally:
+            loop.close()
+
+        self.assertNotEqual(pid, os.getpid())
+        self.assertTrue(thread._shutdown)
+        self.assertTrue(process._shutdown_thread)
+
+    def test_process_pool(self):
+
+        def python(code):
+            return sys.executable, '-u', '-c', code
+
+        started = time.perf_counter()
+        results = run_processes(
+            [python('import sys, time; time.sleep(0.2); print(%i); sys.exit(%i)' % (i, i % 2)) for i in range(4)]
+            + [python('import time; time.sleep(10)')]
+            #closing the output does not stop the timeout
+            + [python('import os, time; os.close(1); os.close(2); time.sleep(10)')],
+            concurrency=6,
+            timeout=0.6)
+
+        self.assertLess(time.perf_counter() - started, 5)
+        self.assertEqual([result.returncode for result in results[:4]], [0, 1, 0, 1])
+        self.assertEqual([result.output for result in results[:4]], [b'0\n', b'1\n', b'2\n', b'3\n'])
+        self.assertTrue(results[4].timed_out)
+        self.assertTrue(results[5].timed_out)
+        self.assertFalse(results[0].timed_out)
+
+        #the shell exits on timeout, while the sleeping child keeps the output open
+        started = time.perf_counter()
+        result, = run_processes([('sh', '-c', 'sleep 5; echo hi')], timeout=1)
+
+        self.assertLess(time.perf_counter() - started, 2)
+        self.assertTrue(result.timed_out)
+        self.assertEqual(result.output, b'')
+
+        pool = ProcessPool(concurrency=2)
+
+        async def run():
+            lines = [line async for line in pool.lines(python('for i in range(3): print(i)'))]
+            with self.assertRaises(subprocess.CalledProcessError):
+                async for line in pool.lines(python('import sys; sys.exit(3)')):
+                    pass
+            return lines
+
+        loop = asyncio.new_event_loop()
+        try:
+            self.assertEqual(loop.run_until_complete(run()), ['0\n', '1\n', '2\n'])
+        finally:
+            loop.close()
+
+    def test_force_many(self):
+
+        text = ['a', 'b']
+
+        self.assertIs(force_text_many(text)[0], text[0])
+        self.assertEqual(force_text_many([b'a', 'b', 1, None]), ['a', 'b', '1', 'None'])
+        self.assertEqual(force_text_many([b'\xff'], errors='replace'), ['\ufffd'])
+        self.assertEqual(force_bytes_many(['\xe8', b'x', 2, bytearray(b'y')]), [b'\xc3\xa8', b'x', b'2', b'y'])
+        self.assertEqual(force_bytes_many(['\xe8'], encoding='latin-1'), [b'\xe8'])
+        self.assertEqual(force_text_columns([(b'a', 1), ('b', 2.5)]), [('a', '1'), ('b', '2.5')])
+
+        with self.assertRaises(ValueError):
+            force_text_columns([(1, 2), (1, )])
+
+        buffer, offsets = force_bytes_joined(['ab', 3, ''])
+
+        self.assertEqual(buffer, b'ab3')
+        self.assertEqual(list(offsets), [0, 2, 3, 3])
+
+    def test_iter_decode(self):
+
+        text = 'caf\xe9 \u20ac \U0001d11e' * 10
+
+        for encoding in ('utf-8', 'utf-8-sig', 'utf-16', 'utf-32'):
+            payload = text.encode(encoding)
+            chunks = [payload[i:i + 3] for i in range(0, len(payload), 3)]
+
+            self.assertEqual(''.join(iter_decode(chunks)), text)
+
+        self.assertEqual(''.join(iter_decode([b'a\xff', b'bcd'], errors='replace')), 'a\ufffdbcd')
+        self.assertEqual(''.join(iter_decode([b'\xef\xbb\xbfa'], sniff_bom=False)), '\ufeffa')
+        self.assertEqual(b''.join(iter_encode(iter(text), encoding='utf-16')), text.encode('utf-16'))
+
+        with self.assertRaises(UnicodeDecodeError):
+            list(iter_decode([b'abcd\xff']))
+
+    def test_timing_registry(self):
+
+        registry = TimingRegistry()
+
+        for elapsed in range(1, 101):
+            registry.record('sleep', elapsed / 1000)
+
+        with registry.timer('block'):
+            pass
+
+        @registry.instrument()
+        def double(x):
+            return x * 2
+
+        @registry.instrument('rows')
+        def rows(n):
+            yield from range(n)
+
+        @registry.instrument('fetch')
+        async def fetch(x):
+            await asyncio.sleep(0)
+            return x
+
+        loop = asyncio.new_event_loop()
+        try:
+            self.assertEqual(loop.run_until_complete(wait_all(fetch(i) for i in range(3))), [0, 1, 2])
+        finally:
+            loop.close()
+
+        self.assertEqual(double(2), 4)
+        self.assertEqual(list(rows(3)), [0, 1, 2])
+        self.assertEqual(double.__name__, 'double')
+
+        stats = {info.name: info for info in registry.stats()}
+
+        self.assertEqual(registry.stats()[0].name, 'sleep')
+        self.assertEqual(stats['sleep'].count, 100)
+        self.assertEqual(stats['sleep'].min, 0.001)
+        self.assertEqual(stats['sleep'].max, 0.1)
+        self.assertAlmostEqual(stats['sleep'].p50, 0.05, delta=0.05 * 0.05)
+        self.assertAlmostEqual(stats['sleep'].p99, 0.099, delta=0.099 * 0.05)
+        self.assertEqual(stats['fetch'].count, 3)
+        self.assertEqual(stats['rows'].count, 1)
+        self.assertEqual(stats['block'].count, 1)
+        self.assertIn('%s.%s' % (__name__, double.__qualname__), stats)
+
+        self.assertEqual(
+            {info['name']: info['count'] for info in json.loads(registry.to_json())}['sleep'], 100)
+        self.assertIn('sleep', registry.report())
+
+        registry.disable()
+
+        self.assertIs(registry.instrument()(double.__wrapped__), double.__wrapped__)
+
+        with registry.timer('block'):
+            pass
+
+        self.assertEqual({info.name: info.count for info in registry.stats()}['block'], 1)
+
+        registry.clear()
+        self.assertEqual(registry.stats(), ())
@@ -2,12 +2,13 @@
 
 from __future__ import absolute_import, print_function, unicode_literals
 
+import asyncio
 import shutil
 import tempfile
 import unittest
 
 from rpy.functions.api import fernet
-from rpy.password.keychain import KeyChain
+from rpy.password.keychain import AsyncKeyChain, KeyChain
 
 
 class TestCase(unittest.TestCase):
@@ -55,3 +56,30 @@ class TestCase(unittest.TestCase):
         shutil.rmtree(f1)
         shutil.rmtree(f2)
         shutil.rmtree(f3)
+
+    def test_async_keychain(self):
+
+        f1, p1 = self.credentials()
+
+        kc = AsyncKeyChain(default = (f1, p1), concurrency = 2)
+
+        async def run():
+            for i in range(5):
+                await kc.set_secret('key%s' % i, i)
+            await kc.delete_secret('key4')
+            return (
+                await kc.get_secret('key0'),
+                await kc.get_many(['key1', 'key2', 'key3', 'key4']),
+                sorted([name async for name in kc.list_secrets()])
+            )
+
+        loop = asyncio.new_event_loop()
+        try:
+            self.assertEqual(
+                loop.run_until_complete(run()),
+                (0, {'key1': 1, 'key2': 2, 'key3': 3, 'key4': None}, ['key0', 'key1', 'key2', 'key3'])
+            )
+        finally:
+            loop.close()
+
+        shutil.rmtree(f1)
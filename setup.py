@@ -12,14 +12,17 @@ import codecs
 
 from setuptools import setup, find_packages
 
+from rpy import __version__
+
 HERE = os.path.abspath(os.path.dirname(__file__))
 
 CLASSIFIERS = [
     "License :: OSI Approved :: MIT License",
     "Programming Language :: Python",
-    "Programming Language :: Python :: 3.5",
-    "Programming Language :: Python :: 3.6",
-    "Programming Language :: Python :: 3.7",
+    "Programming Language :: Python :: 3.8",
+    "Programming Language :: Python :: 3.9",
+    "Programming Language :: Python :: 3.10",
+    "Programming Language :: Python :: 3.11",
     "Topic :: Software Development :: Libraries :: Password Manager"
 ]
 
@@ -37,7 +40,7 @@ def load_tests():
 
 setup(
     name = 'python-rpy',
-    version = '1.1.0',
+    version = __version__,
     description = 'A Python library with various functional tools.',
     long_description = read('README.rst'),
     long_description_content_type = 'text/x-rst',
@@ -47,7 +50,7 @@ setup(
     include_package_data=True,
     packages=find_packages(),
     test_suite='setup.load_tests',
-    python_requires='>=3.5',
+    python_requires='>=3.8',
     install_requires = [
 
     ],